@@ -1,18 +1,37 @@
-import re
+import time
 
-import streamlit as st
-
-from core.services import Services
-from core.config import Config
+script_start = time.perf_counter()
 
+import streamlit as st
 
-config = Config()
-services = Services(config)
+from core.config import config
+from core.telemetry import telemetry
+from logger import logger
 
 st.set_page_config(page_title="Jira SQL Feasibility Dashboard", layout="wide")
 st.title("Jira SQL Feasibility Dashboard")
 st.caption("Automatically checks Jira issues for SQL feasibility using your JiraAgent.")
-spinner_placeholder = st.empty()
+
+
+@st.cache_resource(show_spinner="Connecting to Jira...")
+def get_services():
+    # Built once per process and shared by every session and rerun
+    start = time.perf_counter()
+    from core.services import Services
+
+    services = Services(config)
+    elapsed = time.perf_counter() - start
+    telemetry.observe("startup_services", elapsed)
+    logger.info(f"Services ready in {elapsed:.2f}s")
+    return services
+
+
+try:
+    services = get_services()
+except Exception as e:
+    # Nothing is cached on failure, so the next rerun tries again
+    st.error(f"Failed to start services: {e}")
+    st.stop()
 
 
 # Fetch current in-progress issues from Jira
@@ -21,23 +40,67 @@ def cached_get_in_progress():
     return services.get_in_progress()
 
 
+tab1, tab2, tab3 = st.tabs(["Feasible", "Not Feasible", "In Progress"])
+
+if "first_paint_ms" not in st.session_state:
+    # Script start until the dashboard layout is on screen, once per session
+    first_paint = time.perf_counter() - script_start
+    st.session_state.first_paint_ms = first_paint * 1000
+    telemetry.observe("first_paint", first_paint)
+    logger.info(f"First paint in {first_paint * 1000:.0f} ms")
+
+
+def stream_feasibility_analysis():
+    # Fill the Feasible / Not Feasible tabs as each analysis completes
+    with st.spinner("Fetching Jira issues..."):
+        issues = services.jira_utils.get_issues("To Do")
+
+    progress = st.progress(0.0, text="Running feasibility analysis...")
+    feasible_placeholder = tab1.empty()
+    non_feasible_placeholder = tab2.empty()
+
+    completed = {}
+    for index, analysis in services.iter_issue_feasibility(issues):
+        completed[index] = analysis
+        ordered = [completed[i] for i in sorted(completed)]
+
+        with feasible_placeholder.container():
+            for issue in ordered:
+                if issue["feasible"]:
+                    st.markdown(f"- **{issue['issue_key']}**: {issue['summary']}")
+        with non_feasible_placeholder.container():
+            for issue in ordered:
+                if not issue["feasible"]:
+                    st.markdown(f"- **{issue['issue_key']}**: {issue['summary']}")
+
+        progress.progress(
+            len(completed) / len(issues),
+            text=f"Analysed {len(completed)} of {len(issues)} issues",
+        )
+
+    return [completed[i] for i in sorted(completed)]
+
+
 if "analysed_issues" not in st.session_state:
-    with st.spinner("Fetching Jira issues and running analysis..."):
-        try:
-            st.session_state.analysed_issues = services.analyse_issue_feasibility()
-        except Exception as e:
-            st.error(f"Error: {e}")
-            st.stop()
+    try:
+        st.session_state.analysed_issues = stream_feasibility_analysis()
+    except Exception as e:
+        st.error(f"Error: {e}")
+        st.stop()
+    st.rerun()
 
 analysed_issues = st.session_state.analysed_issues
 
+cache_stats = services.get_feasibility_cache_stats()
+st.caption(
+    f"Feasibility cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+    f"({cache_stats['hit_rate']:.0%} hit rate)"
+)
+
 # Separate into 3 lists
 in_progress_issues = cached_get_in_progress()
 
 
-tab1, tab2, tab3 = st.tabs(["Feasible", "Not Feasible", "In Progress"])
-
-
 with tab1:
     feasible_issues = [issue for issue in analysed_issues if issue["feasible"]]
 
@@ -57,36 +120,14 @@ with tab1:
                     f"Select {issue["issue_key"]} for processing",
                     key=f"btn-{issue["issue_key"]}",
                 ):
-                    with spinner_placeholder, st.spinner(f"Running SQL task for {issue["issue_key"]}..."):
-                        st.success(f"{issue["issue_key"]} selected for processing.")
-                        output = services.run_sql_task(issue["issue_key"])
-
-                        st.session_state.analysed_issues = [
-                            i
-                            for i in st.session_state.analysed_issues
-                            if i["issue_key"] != issue["issue_key"]
-                        ]
-
-                        if output["status"] == "invalid":
-                            st.error(
-                                f"SQL validation failed — unsafe or disallowed query blocked."
-                            )
-    
-
-                        cached_get_in_progress.clear()
-                        st.session_state.in_progress_issues = cached_get_in_progress()
-
-
-                        if output.get("sql"):
-                            st.session_state[f"{issue['issue_key']}_sql"] = output[
-                                "sql"
-                            ].strip()
-                            st.code(
-                                st.session_state[f"{issue['issue_key']}_sql"],
-                                language="sql",
-                            )
-
-                        st.rerun()
+                    # Generation runs in the background; the jobs panel picks up the result
+                    services.enqueue_sql_task(issue["issue_key"])
+                    st.session_state.analysed_issues = [
+                        i
+                        for i in st.session_state.analysed_issues
+                        if i["issue_key"] != issue["issue_key"]
+                    ]
+                    st.rerun()
 
     else:
         st.info("No feasible issues found.")
@@ -106,32 +147,130 @@ with tab2:
     else:
         st.info("No non-feasible issues found.")
 
+@st.fragment(run_every=config.jobs.poll_interval)
+def job_status_panel():
+    jobs = services.job_queue.recent_jobs()
+
+    # Jobs that finished before this session started are not re-applied
+    if "applied_jobs" not in st.session_state:
+        st.session_state.applied_jobs = {
+            job["job_id"] for job in jobs if job["state"] not in ("queued", "running")
+        }
+
+    newly_finished = False
+    for job in jobs:
+        if job["state"] in ("queued", "running") or job["job_id"] in st.session_state.applied_jobs:
+            continue
+        st.session_state.applied_jobs.add(job["job_id"])
+        newly_finished = True
+        if job["kind"] == "sql_task" and job["state"] == "succeeded" and job["result"].get("sql"):
+            st.session_state[f"{job['issue_key']}_sql"] = job["result"]["sql"].strip()
+
+    st.subheader("Background jobs")
+    if jobs:
+        st.dataframe(
+            [
+                {
+                    "Issue": job["issue_key"],
+                    "Job": job["kind"],
+                    "State": job["state"],
+                    "Latency (s)": round(job["latency_seconds"], 1) if job["latency_seconds"] else None,
+                    "Error": job["error"],
+                }
+                for job in jobs
+            ],
+            hide_index=True,
+        )
+    else:
+        st.caption("No jobs yet.")
+
+    if newly_finished:
+        cached_get_in_progress.clear()
+        st.rerun()
+
+
+def render_execution_job(job):
+    if job is None:
+        return
+    if job["state"] in ("queued", "running"):
+        st.info(f"Query {job['state']} in the background...")
+        return
+    if job["state"] == "failed":
+        st.error(f"Query execution failed: {job['error']}")
+        return
+
+    output = job["result"]
+    render_plan(output.get("plan"))
+
+    if output["status"] == "blocked":
+        st.error("Query blocked by the cost guard — refine the SQL before running it.")
+
+    elif output["status"] == "success":
+        st.success("SQL query executed successfully and results posted to Jira.")
+        if output.get("cached"):
+            st.info("Results served from the query result cache.")
+        if output.get("truncated"):
+            st.warning(
+                f"Results were truncated to {output['row_count']} rows by the export limits."
+            )
+
+    elif output["status"] == "empty":
+        st.warning("Generated SQL returned no results.")
+
+
+def render_plan(plan):
+    if not plan:
+        return
+    if "total_cost" in plan:
+        st.markdown(
+            f"**Query plan:** {plan['node_type']} — estimated cost {plan['total_cost']:,.0f}, "
+            f"estimated rows {plan['plan_rows']:,}"
+        )
+        if plan["seq_scans"]:
+            st.markdown("**Full table scans:** " + ", ".join(plan["seq_scans"]))
+    for reason in plan["reasons"]:
+        if plan["verdict"] in ("block", "error"):
+            st.error(reason)
+        elif plan["verdict"] == "warn":
+            st.warning(reason)
+        else:
+            st.info(reason)
+
+
 @st.fragment
 def tab3_content(in_progress_issues):
     if in_progress_issues:
+        # One concurrent batch for every issue whose comments are not cached yet
+        services.jira_utils.prefetch_comments(in_progress_issues)
+
         for issue in in_progress_issues:
             issue_key = issue["issue_key"]
             with st.expander(f"{issue_key}: {issue["summary"]}"):
                 st.markdown(f"**Ticket description:** {issue['description']}")
 
-                if f"{issue_key}_sql" not in st.session_state:
-                    st.session_state[f"{issue_key}_sql"] = ""
+                jira_comments = None
+                if (
+                    f"{issue_key}_sql" not in st.session_state
+                    or f"{issue_key}_chat" not in st.session_state
+                ):
+                    jira_comments = services.jira_utils.get_ticket_comments(
+                        issue_key, issue.get("updated")
+                    )
 
-                    jira_comments = services.jira_utils.get_ticket_comments(issue_key)
-                    bot_sql_comments = [
-                        c["body"] for c in jira_comments if "```" in c["body"]
-                    ]
-                    if bot_sql_comments:
-                        latest_sql = bot_sql_comments[-1]
-                        match = re.search(r"```\n(.*?)\n```", latest_sql, re.S)
-                        if match:
-                            st.session_state[f"{issue_key}_sql"] = match.group(
-                                1
-                            ).strip()
+                if f"{issue_key}_sql" not in st.session_state:
+                    # Fall back to SQL generated by a background job in an earlier session
+                    sql_job = services.job_queue.latest_job(issue_key, "sql_task")
+                    job_sql = (
+                        sql_job["result"].get("sql", "")
+                        if sql_job and sql_job["state"] == "succeeded"
+                        else ""
+                    )
+                    st.session_state[f"{issue_key}_sql"] = (
+                        services.jira_utils.latest_sql(jira_comments) or job_sql.strip()
+                    )
 
                 if f"{issue_key}_chat" not in st.session_state:
                     st.session_state[f"{issue_key}_chat"] = []
-                    jira_comments = services.jira_utils.get_ticket_comments(issue_key)
                     for comment in jira_comments:
                         st.session_state[f"{issue_key}_chat"].append(
                             {"role": "user", "content": comment["body"]}
@@ -142,16 +281,17 @@ def tab3_content(in_progress_issues):
                     st.markdown("**Generated SQL:**")
                     sql_placeholder.code(st.session_state[f"{issue_key}_sql"], language="sql")
                 
-                if st.button(f"Run query and post to Jira", key=f"run_{issue_key}"):
-                    with st.spinner(f"Executing SQL query..."):
-                        sql_query = st.session_state[f"{issue_key}_sql"]
-                        output = services.execute_sql_and_post(issue_key, sql_query)
-
-                        if output["status"] == "success":
-                            st.success("SQL query executed successfully and results posted to Jira.")
+                if st.button(f"Check query plan", key=f"plan_{issue_key}"):
+                    with st.spinner(f"Running EXPLAIN..."):
+                        render_plan(
+                            services.explain_sql(st.session_state[f"{issue_key}_sql"])
+                        )
 
-                        elif output["status"] == "empty":
-                            st.warning("Generated SQL returned no results.")
+                if st.button(f"Run query and post to Jira", key=f"run_{issue_key}"):
+                    services.enqueue_execute_sql(
+                        issue_key, st.session_state[f"{issue_key}_sql"]
+                    )
+                render_execution_job(services.job_queue.latest_job(issue_key, "execute"))
 
                 user_feedback = st.text_area(
                     f"Add feedback / instructions for {issue_key}",
@@ -179,3 +319,73 @@ def tab3_content(in_progress_issues):
 
 with tab3:
     tab3_content(cached_get_in_progress())
+
+def diagnostics_panel():
+    report = services.get_telemetry()
+
+    st.caption(f"First paint this session: {st.session_state.first_paint_ms:.0f} ms")
+
+    st.subheader("Recent traces")
+    if report["traces"]:
+        st.dataframe(
+            [
+                {
+                    "Issue": trace["issue_key"],
+                    "Trace": trace["name"],
+                    "Status": trace["status"],
+                    "Total (ms)": round(trace["duration_ms"]),
+                    "Stages": ", ".join(
+                        f"{span['name']} {span['duration_ms']:.0f}"
+                        for span in trace["spans"]
+                        if span["depth"] > 0
+                    ),
+                }
+                for trace in report["traces"]
+            ],
+            hide_index=True,
+        )
+    else:
+        st.caption("No traces yet.")
+
+    st.subheader("Stage totals")
+    st.dataframe(report["spans"], hide_index=True)
+
+    st.subheader("SQL review pass")
+    review = services.get_review_stats()
+    if review is None:
+        st.caption("Unavailable until the SQL context loads.")
+    else:
+        ran = review["reviewed"] + review["skipped"]
+        st.caption(
+            f"Skipped {review['skipped']} of {ran} reviews "
+            f"({review['skipped'] / ran if ran else 0:.0%}); "
+            f"{review['changed']} of {review['reviewed']} reviews changed the SQL"
+        )
+
+    st.subheader("Solved-ticket reuse")
+    solved = services.get_solved_ticket_stats()
+    if solved is None:
+        st.caption("Unavailable until the SQL context loads.")
+    else:
+        st.caption(
+            f"{solved['hits']} of {solved['lookups']} lookups matched a solved ticket "
+            f"({solved['hit_rate']:.0%} hit rate)"
+        )
+
+    st.subheader("Connection pools")
+    st.dataframe(
+        [{"Database": url, **stats} for url, stats in services.get_pool_stats().items()],
+        hide_index=True,
+    )
+    st.download_button(
+        "Download Prometheus metrics",
+        report["prometheus"],
+        file_name="metrics.prom",
+        mime="text/plain",
+    )
+
+
+with st.sidebar:
+    job_status_panel()
+    if st.toggle("Diagnostics"):
+        diagnostics_panel()
@@ -0,0 +1,199 @@
+"""Deterministic local stand-ins for OpenAI and Jira used by the benchmarks"""
+
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from core.embeddings import HashingEmbeddings
+
+
+class CallCounter:
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def record(self, items=1):
+        with self._lock:
+            self.calls += 1
+            self.items += items
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "items": self.items}
+
+
+class FakeChatModel:
+    """Stands in for ChatOpenAI, including with_structured_output"""
+
+    def __init__(self, sql, latency=0.0):
+        self.sql = sql
+        self.latency = latency
+        self.counter = CallCounter()
+
+    def _respond(self, prompt):
+        self.counter.record(len(str(prompt)))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def invoke(self, prompt):
+        self._respond(prompt)
+        return SimpleNamespace(content=f"```sql\n{self.sql}\n```")
+
+    def with_structured_output(self, schema):
+        return _StructuredFake(self, schema)
+
+
+class _StructuredFake:
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def invoke(self, prompt):
+        self.model._respond(prompt)
+        values = {"sql": self.model.sql, "notes": "benchmark"}
+        return self.schema(**{k: v for k, v in values.items() if k in self.schema.model_fields})
+
+
+class HashEmbeddings(HashingEmbeddings):
+    """Local hashing embedder that counts calls and can simulate API latency"""
+
+    def __init__(self, dim=256, latency=0.0):
+        super().__init__(dim=dim, max_workers=1)
+        self.latency = latency
+        self.counter = CallCounter()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        self.counter.record(len(texts))
+        if self.latency:
+            time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def fake_openai_client(latency=0.0, counter=None):
+    """Returns a drop-in for openai.Client that answers feasibility prompts"""
+    counter = counter or CallCounter()
+
+    class FakeCompletions:
+        def create(self, model, messages, **kwargs):
+            prompt = messages[-1]["content"]
+            counter.record(len(prompt))
+            if latency:
+                time.sleep(latency)
+            key = re.search(r'"issue_key": "([^"]+)"', prompt)
+            content = {
+                "issue_key": key.group(1) if key else "",
+                "summary": "",
+                "feasible": True,
+                "confidence": "High",
+                "complexity_score": 3,
+                "reasoning": "Benchmark response.",
+                "missing_information": [],
+                "potential_risks": [],
+            }
+            message = SimpleNamespace(content=json.dumps(content))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    class FakeClient:
+        def __init__(self, api_key=None, timeout=None, **kwargs):
+            self.chat = SimpleNamespace(completions=FakeCompletions())
+
+    FakeClient.counter = counter
+    return FakeClient
+
+
+class _ResultList(list):
+    def __init__(self, items, total):
+        super().__init__(items)
+        self.total = total
+
+
+class FakeIssue:
+    def __init__(self, key, summary, description, status="To Do"):
+        self.key = key
+        self.fields = SimpleNamespace(
+            summary=summary,
+            description=description,
+            updated="2024-01-01T00:00:00.000+0000",
+            status=SimpleNamespace(name=status),
+            assignee=None,
+        )
+
+    def update(self, assignee=None, **kwargs):
+        self.fields.assignee = assignee
+
+    def __str__(self):
+        return self.key
+
+
+class FakeJira:
+    """In-memory Jira covering the client calls made by JiraUtils and Services"""
+
+    _is_cloud = False
+
+    def __init__(self, issues, latency=0.0):
+        self.issues = {issue.key: issue for issue in issues}
+        self.latency = latency
+        self.counter = CallCounter()
+        self._comments = {}
+        self.attachments = {}
+        self._lock = threading.Lock()
+
+    def _call(self):
+        self.counter.record()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def search_issues(self, jql, startAt=0, maxResults=50, fields=None, expand=None, **kwargs):
+        self._call()
+        status = re.search(r'status="([^"]+)"', jql)
+        matching = [
+            issue
+            for issue in self.issues.values()
+            if status is None or issue.fields.status.name == status.group(1)
+        ]
+        return _ResultList(matching[startAt : startAt + maxResults], len(matching))
+
+    def issue(self, issue_key, fields=None, **kwargs):
+        self._call()
+        return self.issues[issue_key]
+
+    def comments(self, issue_key):
+        self._call()
+        with self._lock:
+            return list(self._comments.get(issue_key, []))
+
+    def add_comment(self, issue_key, body):
+        self._call()
+        with self._lock:
+            comments = self._comments.setdefault(issue_key, [])
+            comments.append(
+                SimpleNamespace(
+                    id=str(len(comments) + 1),
+                    author=SimpleNamespace(displayName="benchmark"),
+                    body=body,
+                    created="2024-01-01T00:00:00.000+0000",
+                )
+            )
+
+    def add_attachment(self, issue, attachment, filename=None):
+        self._call()
+        with open(attachment, "rb") as f:
+            self.attachments[(issue, filename)] = len(f.read())
+
+    def transitions(self, issue_key):
+        self._call()
+        return [{"id": "21", "name": "In Progress"}]
+
+    def transition_issue(self, issue_key, transition_id):
+        self._call()
+        self.issues[issue_key].fields.status.name = "In Progress"
+
+    def current_user(self):
+        return "benchmark"
@@ -0,0 +1,132 @@
+"""SQLite fixture database and Jira tickets of configurable size"""
+
+import os
+import random
+import sqlite3
+
+from benchmarks.fakes import FakeIssue
+
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa",
+    "quebec", "romeo", "sierra", "tango", "uniform", "victor", "whiskey", "yankee",
+    "amber", "cobalt", "crimson", "indigo", "jade", "ochre", "scarlet", "teal",
+]
+
+# Distinct values per text column; keeps value sampling representative
+TEXT_CARDINALITY = 40
+
+
+def table_name(i):
+    return f"t{i:03d}"
+
+
+def build_schema(tables, width):
+    """Schema rows in the same shape SchemaStore builds from information_schema"""
+    rows = []
+    for t in range(tables):
+        name = table_name(t)
+        rows.append(
+            {"table": name, "column": "id", "type": "integer", "primary_key": True, "references": None}
+        )
+        if t > 0:
+            rows.append(
+                {
+                    "table": name,
+                    "column": "parent_id",
+                    "type": "integer",
+                    "primary_key": False,
+                    "references": {"table": table_name(t - 1), "column": "id"},
+                }
+            )
+        for c in range(width):
+            # Two thirds text, the rest numeric
+            col_type = "integer" if c % 3 == 2 else "text"
+            rows.append(
+                {
+                    "table": name,
+                    "column": f"{WORDS[c % len(WORDS)]}_{c}",
+                    "type": col_type,
+                    "primary_key": False,
+                    "references": None,
+                }
+            )
+    return rows
+
+
+def column_values(column):
+    word = column.rsplit("_", 1)[0]
+    return [f"{word} {WORDS[i % len(WORDS)]} {i}" for i in range(TEXT_CARDINALITY)]
+
+
+def build_database(path, schema_rows, rows_per_table, seed=0):
+    """Creates and fills the SQLite fixture; returns its SQLAlchemy URL"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+
+    by_table = {}
+    for r in schema_rows:
+        by_table.setdefault(r["table"], []).append(r)
+
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for table, columns in by_table.items():
+                defs = []
+                for c in columns:
+                    sql_type = "INTEGER" if c["type"] == "integer" else "TEXT"
+                    definition = f'"{c["column"]}" {sql_type}'
+                    if c["primary_key"]:
+                        definition += " PRIMARY KEY"
+                    if c["references"]:
+                        definition += f' REFERENCES "{c["references"]["table"]}"("{c["references"]["column"]}")'
+                    defs.append(definition)
+                conn.execute(f'CREATE TABLE "{table}" ({", ".join(defs)})')
+
+                pools = {
+                    c["column"]: column_values(c["column"])
+                    for c in columns
+                    if c["type"] == "text"
+                }
+                data = []
+                for i in range(rows_per_table):
+                    row = []
+                    for c in columns:
+                        if c["primary_key"]:
+                            row.append(i + 1)
+                        elif c["references"]:
+                            row.append(rng.randint(1, rows_per_table))
+                        elif c["type"] == "text":
+                            row.append(rng.choice(pools[c["column"]]))
+                        else:
+                            row.append(rng.randint(0, 10000))
+                    data.append(row)
+                placeholders = ", ".join("?" for _ in columns)
+                conn.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', data)
+    finally:
+        conn.close()
+
+    return f"sqlite:///{path}"
+
+
+def build_issues(schema_rows, count, seed=0):
+    """Tickets that name real columns and values from the fixture"""
+    rng = random.Random(seed)
+    text_columns = [r for r in schema_rows if r["type"] == "text"]
+    issues = []
+    for i in range(count):
+        target = rng.choice(text_columns)
+        group_by = rng.choice(text_columns)
+        value = rng.choice(column_values(target["column"]))
+        issues.append(
+            FakeIssue(
+                f"BENCH-{i + 1}",
+                f"Count {target['table']} rows by {group_by['column']}",
+                (
+                    f"Export a CSV of {target['table']} where {target['column']} is "
+                    f"'{value}', grouped by {group_by['column']} with a row count."
+                ),
+            )
+        )
+    return issues
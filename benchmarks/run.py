@@ -0,0 +1,342 @@
+"""Times the pipeline against local fakes at several scales.
+
+    python -m benchmarks.run --scales small medium --output results.json
+    python -m benchmarks.run --baseline results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+# The OpenAI clients refuse to construct without a key; no request is ever sent
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from langchain_community.utilities import SQLDatabase
+
+from benchmarks.fakes import FakeChatModel, FakeJira, HashEmbeddings, fake_openai_client
+from benchmarks.fixtures import build_database, build_issues, build_schema, table_name
+from core.config import config
+from core.database_connector import get_engine
+from core.embedding_cache import EmbeddingCache
+from core.feasibility_cache import FeasibilityCache
+from core.result_cache import ResultCache
+from core.services import Services
+from core.solved_ticket_store import SolvedTicketStore
+from core.sql_rag_agent import SQLRAGAgent, SQLRAGContext
+from core.telemetry import telemetry
+from core.value_sampler import ValueSampler
+from logger import logger
+
+SCALES = {
+    "small": {"tables": 5, "width": 8, "rows": 500, "issues": 10},
+    "medium": {"tables": 20, "width": 16, "rows": 2000, "issues": 50},
+    "large": {"tables": 60, "width": 24, "rows": 2000, "issues": 200},
+}
+
+
+def parse_scale(spec):
+    """Preset name, or TABLESxWIDTHxROWSxISSUES"""
+    if spec in SCALES:
+        return spec, SCALES[spec]
+    try:
+        tables, width, rows, issues = (int(p) for p in spec.split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Unknown scale '{spec}': use {', '.join(SCALES)} or TABLESxWIDTHxROWSxISSUES"
+        )
+    return spec, {"tables": tables, "width": width, "rows": rows, "issues": issues}
+
+
+def summarise(samples):
+    return {
+        "runs": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+class StageTimer:
+    def __init__(self, repeat, counters):
+        self.repeat = repeat
+        self.counters = counters
+        self.stages = {}
+
+    def time(self, name, fn, setup=None):
+        """Runs fn `repeat` times; setup runs untimed before each run"""
+        samples = []
+        before = {k: c.snapshot() for k, c in self.counters.items()}
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+
+        stage = summarise(samples)
+        # Calls made to each fake per run, so extra LLM or API round trips show up too
+        for key, counter in self.counters.items():
+            after = counter.snapshot()
+            stage[f"{key}_calls"] = (after["calls"] - before[key]["calls"]) / self.repeat
+        self.stages[name] = stage
+        logger.warning(f"{name}: median {stage['median'] * 1000:.1f} ms over {self.repeat} runs")
+
+
+def run_scale(name, params, args, workdir):
+    scale_dir = os.path.join(workdir, name)
+    os.makedirs(scale_dir, exist_ok=True)
+
+    schema_rows = build_schema(params["tables"], params["width"])
+    db_url = build_database(
+        os.path.join(scale_dir, "fixture.sqlite"), schema_rows, params["rows"]
+    )
+    issues = build_issues(schema_rows, params["issues"])
+
+    llm = FakeChatModel(
+        f'SELECT * FROM "{table_name(0)}" LIMIT {args.result_rows}', latency=args.llm_latency
+    )
+    embeddings = HashEmbeddings(latency=args.embedding_latency)
+    openai_client = fake_openai_client(latency=args.llm_latency)
+    jira = FakeJira(issues, latency=args.jira_latency)
+
+    engine = get_engine(db_url)
+    ctx = SQLRAGContext(db_url, "benchmark", db=SQLDatabase(engine), llm=llm)
+    ctx.value_store.embeddings = embeddings
+    ctx.value_store.embedding_model = embeddings.embedder_id
+    ctx.schema_store.load_snapshot(schema_rows)
+    ctx.solved_store = SolvedTicketStore(
+        os.path.join(scale_dir, "solved_tickets"),
+        embeddings,
+        threshold=config.solved_tickets.example_threshold,
+        embedder_id=embeddings.embedder_id,
+    )
+
+    timer = StageTimer(
+        args.repeat,
+        {
+            "llm": SimpleNamespace(snapshot=lambda: _merged(llm, openai_client)),
+            "embedding": embeddings.counter,
+            "jira": jira.counter,
+        },
+    )
+
+    with ExitStack() as stack:
+        patches = {
+            "core.services.JiraConnector": lambda cfg: SimpleNamespace(
+                get_jira_connection=lambda: jira
+            ),
+            "core.services.SQLALCHEMY_URL": db_url,
+            "core.services.FEASIBILITY_CACHE_PATH": os.path.join(scale_dir, "feasibility.sqlite"),
+            "core.services.RESULT_CACHE_DIR": os.path.join(scale_dir, "results"),
+            "core.services.JOBS_DB_PATH": os.path.join(scale_dir, "jobs.sqlite"),
+            "core.services.get_context": lambda *a, **kw: ctx,
+            "core.jira_agent.openai.Client": openai_client,
+        }
+        for target, value in patches.items():
+            stack.enter_context(mock.patch(target, value))
+        # pg_stat freshness needs PostgreSQL
+        stack.enter_context(mock.patch.object(config.result_cache, "freshness", "ttl"))
+        # Keep traces and metrics out of the real data directory
+        stack.enter_context(
+            mock.patch.object(telemetry, "trace_log_path", os.path.join(scale_dir, "traces.jsonl"))
+        )
+        stack.enter_context(
+            mock.patch.object(telemetry, "metrics_path", os.path.join(scale_dir, "metrics.prom"))
+        )
+
+        services = Services(config)
+
+        # Feasibility analysis, cold and with every issue cached
+        def fresh_feasibility_cache():
+            path = os.path.join(scale_dir, f"feasibility-{time.monotonic_ns()}.sqlite")
+            services.feasibility_cache = FeasibilityCache(path)
+            services.jira_agent.cache = services.feasibility_cache
+
+        timer.time(
+            "analyse_issue_feasibility",
+            services.analyse_issue_feasibility,
+            setup=fresh_feasibility_cache,
+        )
+        timer.time("analyse_issue_feasibility_cached", services.analyse_issue_feasibility)
+
+        # Index build from scratch, then incremental with the embedding cache
+        index_path = os.path.join(scale_dir, "faiss_index")
+        embedding_cache = EmbeddingCache(os.path.join(scale_dir, "embeddings.sqlite"))
+
+        def sampler():
+            return ValueSampler(
+                engine,
+                per_column_limit=args.per_column_limit,
+                max_workers=config.index.sample_workers,
+            )
+
+        timer.time(
+            "initialize_indexes",
+            lambda: ctx.initialize_indexes(
+                per_column_limit=args.per_column_limit, sampler=sampler()
+            ),
+        )
+        ctx.value_store.save(index_path)
+        ctx.initialize_indexes(
+            per_column_limit=args.per_column_limit,
+            index_path=index_path,
+            incremental=True,
+            embedding_cache=embedding_cache,
+            sampler=sampler(),
+        )
+        timer.time(
+            "initialize_indexes_incremental",
+            lambda: ctx.initialize_indexes(
+                per_column_limit=args.per_column_limit,
+                index_path=index_path,
+                incremental=True,
+                embedding_cache=embedding_cache,
+                sampler=sampler(),
+            ),
+        )
+
+        # Retrieval and generation over a fixed slice of tickets
+        sample_issues = issues[: args.tickets]
+        texts = [f"{i.fields.summary}\n{i.fields.description}" for i in sample_issues]
+        timer.time(
+            "retrieve_relevant_values",
+            lambda: [ctx.retrieve_relevant_values(t) for t in texts],
+        )
+        timer.time(
+            "retrieve_relevant_values_batch",
+            lambda: ctx.retrieve_relevant_values_batch(texts),
+            setup=ctx.value_store.query_cache.clear,
+        )
+        agent = SQLRAGAgent(ctx)
+        timer.time("sql_rag_agent_run", lambda: [agent.run(i) for i in sample_issues])
+
+        # Execution and export, cold and served from the result cache
+        def fresh_result_cache():
+            path = os.path.join(scale_dir, f"results-{time.monotonic_ns()}")
+            services.result_cache = ResultCache(path)
+
+        sql_query = llm.sql
+        timer.time(
+            "execute_sql_and_post",
+            lambda: services.execute_sql_and_post(sample_issues[0].key, sql_query),
+            setup=fresh_result_cache,
+        )
+        timer.time(
+            "execute_sql_and_post_cached",
+            lambda: services.execute_sql_and_post(sample_issues[0].key, sql_query),
+        )
+
+    engine.dispose()
+    return {"scale": name, "params": params, "stages": timer.stages}
+
+
+def _merged(*fakes):
+    snapshots = [getattr(f, "counter").snapshot() for f in fakes]
+    return {
+        "calls": sum(s["calls"] for s in snapshots),
+        "items": sum(s["items"] for s in snapshots),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Lists stages whose median slowed by more than tolerance against the baseline"""
+    previous = {
+        (r["scale"], stage): summary["median"]
+        for r in baseline["results"]
+        for stage, summary in r["stages"].items()
+    }
+    regressions = []
+    for r in results:
+        for stage, summary in r["stages"].items():
+            old = previous.get((r["scale"], stage))
+            if old is None:
+                continue
+            new = summary["median"]
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append(
+                    {"scale": r["scale"], "stage": stage, "baseline": old, "current": new}
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", type=parse_scale, default=[parse_scale("small"), parse_scale("medium")])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tickets", type=int, default=5, help="Tickets per retrieval/generation run")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds per fake embedding batch")
+    parser.add_argument("--jira-latency", type=float, default=0.0, help="Seconds per fake Jira call")
+    parser.add_argument("--per-column-limit", type=int, default=200)
+    parser.add_argument("--result-rows", type=int, default=1000)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Ignore slowdowns under this many seconds")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Per-stage summaries are logged as warnings so they stay visible
+        logger.setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="jira_sql_bench_")
+    try:
+        results = [run_scale(name, params, args, workdir) for name, params in args.scales]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                k: v for k, v in vars(args).items() if k not in ("scales", "baseline", "output", "verbose")
+            },
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['scale']}/{r['stage']}: "
+                f"{r['baseline'] * 1000:.1f} ms -> {r['current'] * 1000:.1f} ms"
+            )
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
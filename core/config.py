@@ -13,6 +13,12 @@ class DatabaseConfig:
         self.dbname = os.getenv("DB_NAME", "tradeall")
         self.user = os.getenv("DB_USER", "jira_agent")
         self.password = os.getenv("DB_PASSWORD", "")
+        # Connection pool shared by every engine user in the process
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
     @property
     def sqlalchemy_connection_string(self):
@@ -26,13 +32,107 @@ class JiraConfig:
         self.username = os.getenv("JIRA_USERNAME", "")
         self.jira_api_token = os.getenv("JIRA_API_KEY", "")
         self.jira_project_key = os.getenv("JIRA_PROJECT_KEY", "Projects")
+        # Issue search paging
+        self.page_size = int(os.getenv("JIRA_PAGE_SIZE", "100"))
+        self.max_issues = int(os.getenv("JIRA_MAX_ISSUES", "1000"))
+        self.fetch_workers = int(os.getenv("JIRA_FETCH_WORKERS", "4"))
 
 
 class OpenAIConfig:
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY", "")
         self.openai_model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        # OpenAI model name, "hashing[:dim]" or "sentence-transformers:<model>" for local CPU embedding
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+        self.embedding_workers = int(os.getenv("EMBEDDING_WORKERS", "4"))
+        self.schema_token_budget = int(os.getenv("SCHEMA_TOKEN_BUDGET", "8000"))
+        # Generated SQL above this complexity is always sent through the review LLM
+        self.review_complexity_threshold = int(os.getenv("REVIEW_COMPLEXITY_THRESHOLD", "6"))
+
+
+class AnalysisConfig:
+    def __init__(self):
+        # Bounded concurrency for feasibility analysis of "To Do" issues
+        self.max_workers = int(os.getenv("ANALYSIS_MAX_WORKERS", "8"))
+        self.request_timeout = float(os.getenv("ANALYSIS_REQUEST_TIMEOUT", "60"))
+        # Persistent cache of feasibility results
+        self.cache_ttl_seconds = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+        self.cache_max_entries = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000"))
+
+
+class IndexConfig:
+    def __init__(self):
+        # Value sampling for the vector index build
+        self.per_column_limit = int(os.getenv("INDEX_PER_COLUMN_LIMIT", "200"))
+        self.sample_workers = int(os.getenv("INDEX_SAMPLE_WORKERS", "4"))
+        self.sample_scan_rows = int(os.getenv("INDEX_SAMPLE_SCAN_ROWS", "100000"))
+        self.use_pg_stats = os.getenv("INDEX_USE_PG_STATS", "true").lower() == "true"
+        # Ticket-text embeddings kept in memory for retrieval
+        self.query_cache_entries = int(os.getenv("QUERY_EMBEDDING_CACHE_ENTRIES", "1024"))
+        # On-disk embedding cache; entries unused for the TTL are dropped
+        self.embedding_cache_ttl_seconds = int(
+            os.getenv("EMBEDDING_CACHE_TTL", str(90 * 24 * 3600))
+        )
+        self.embedding_cache_max_entries = int(
+            os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000")
+        )
+        # flat, ivf_flat, hnsw, ivf_sq8, ivf_pq, or a raw faiss.index_factory string
+        self.faiss_index_type = os.getenv("FAISS_INDEX_TYPE", "flat")
+        self.faiss_nprobe = int(os.getenv("FAISS_NPROBE", "16"))
+        self.faiss_ef_search = int(os.getenv("FAISS_EF_SEARCH", "64"))
+        self.faiss_train_size = int(os.getenv("FAISS_TRAIN_SIZE", "50000"))
+        # vector, lexical or hybrid; hybrid skips embedding when this many values match verbatim
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.lexical_shortcut_hits = int(os.getenv("RETRIEVAL_LEXICAL_SHORTCUT_HITS", "2"))
+
+
+class ExportConfig:
+    def __init__(self):
+        # Limits for query results exported to Jira
+        self.max_rows = int(os.getenv("EXPORT_MAX_ROWS", "1000000"))
+        self.max_bytes = int(os.getenv("EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.chunk_size = int(os.getenv("EXPORT_CHUNK_SIZE", "10000"))
+
+
+class QueryGuardConfig:
+    def __init__(self):
+        # Pre-execution EXPLAIN thresholds and execution limits for generated SQL
+        self.max_cost = float(os.getenv("QUERY_MAX_COST", "1000000"))
+        self.max_rows = float(os.getenv("QUERY_MAX_ESTIMATED_ROWS", "10000000"))
+        self.block = os.getenv("QUERY_GUARD_MODE", "block").lower() == "block"
+        self.statement_timeout_ms = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "60000"))
+
+
+class ResultCacheConfig:
+    def __init__(self):
+        # Exported query results reused across repeated runs
+        self.max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+        self.ttl_seconds = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+        # "ttl" relies on expiry only, "pg_stat" also keys on table modification counters
+        self.freshness = os.getenv("RESULT_CACHE_FRESHNESS", "pg_stat").lower()
+
+
+class SolvedTicketConfig:
+    def __init__(self):
+        # Similarity above which a past ticket's SQL is shown as a few-shot example
+        self.example_threshold = float(os.getenv("SOLVED_TICKET_EXAMPLE_THRESHOLD", "0.85"))
+        # Similarity above which the past SQL is adapted in a single LLM call
+        self.adapt_threshold = float(os.getenv("SOLVED_TICKET_ADAPT_THRESHOLD", "0.95"))
+
+
+class JobConfig:
+    def __init__(self):
+        # Background workers for SQL generation and execution
+        self.max_workers = int(os.getenv("JOB_MAX_WORKERS", "4"))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+
+class TelemetryConfig:
+    def __init__(self):
+        # Per-ticket traces as JSON lines plus a Prometheus text file
+        self.enabled = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+        self.recent_traces = int(os.getenv("TELEMETRY_RECENT_TRACES", "200"))
 
 
 # Control panel for settings, container that holds all configurations
@@ -41,6 +141,14 @@ class Config:
         self.database = DatabaseConfig()  # Creates database settings
         self.jira = JiraConfig()  # Creates jira settings
         self.openai = OpenAIConfig()  # Creates openai settings
+        self.analysis = AnalysisConfig()  # Creates feasibility analysis settings
+        self.export = ExportConfig()  # Creates result export settings
+        self.index = IndexConfig()  # Creates vector index build settings
+        self.query_guard = QueryGuardConfig()  # Creates SQL execution guard settings
+        self.result_cache = ResultCacheConfig()  # Creates query result cache settings
+        self.solved_tickets = SolvedTicketConfig()  # Creates solved-ticket reuse settings
+        self.jobs = JobConfig()  # Creates background job settings
+        self.telemetry = TelemetryConfig()  # Creates tracing and metrics settings
 
 
 config = Config()
@@ -49,4 +157,12 @@ SQLALCHEMY_URL = config.database.sqlalchemy_connection_string
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 SCHEMA_PATH = os.path.join(BASE_DIR, "data", "schema.json")
+SCHEMA_FINGERPRINT_PATH = os.path.join(BASE_DIR, "data", "schema_fingerprint.json")
 VECTOR_PATH = os.path.join(BASE_DIR, "data", "faiss_index")
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "data", "embedding_cache.sqlite")
+SOLVED_TICKETS_PATH = os.path.join(BASE_DIR, "data", "solved_tickets_index")
+JOBS_DB_PATH = os.path.join(BASE_DIR, "data", "jobs.sqlite")
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "data", "result_cache")
+FEASIBILITY_CACHE_PATH = os.path.join(BASE_DIR, "data", "feasibility_cache.sqlite")
+TRACE_LOG_PATH = os.path.join(BASE_DIR, "data", "traces.jsonl")
+METRICS_PATH = os.path.join(BASE_DIR, "data", "metrics.prom")
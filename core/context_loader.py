@@ -1,25 +1,114 @@
 import json
+import os
+import threading
 
-from langchain.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-
-from core.config import SCHEMA_PATH, SQLALCHEMY_URL, VECTOR_PATH
+from core.config import (
+    EMBEDDING_CACHE_PATH,
+    SCHEMA_PATH,
+    SOLVED_TICKETS_PATH,
+    SQLALCHEMY_URL,
+    VECTOR_PATH,
+    config,
+)
+from core.embedding_cache import EmbeddingCache
+from core.solved_ticket_store import SolvedTicketStore
 from core.sql_rag_agent import SQLRAGContext
+from logger import logger
 
+_warm_contexts = {}
+_warm_lock = threading.Lock()
+
+
+def snapshot_fingerprint():
+    # Cheap change detection for the schema snapshot and the FAISS index files
+    paths = [SCHEMA_PATH]
+    if os.path.isdir(VECTOR_PATH):
+        paths += [
+            os.path.join(VECTOR_PATH, name) for name in sorted(os.listdir(VECTOR_PATH))
+        ]
+
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
 
-def load_context(openai_model="gpt-4o-mini"):
-    ctx = SQLRAGContext(SQLALCHEMY_URL, openai_model)
 
+def _apply_snapshot(ctx):
     # Load schema snapshot
     with open(SCHEMA_PATH, "r") as f:
         cached_schema = json.load(f)
 
-    ctx.schema_store.fetch_schema = lambda: cached_schema
+    ctx.schema_store.load_snapshot(cached_schema)
 
-    # Load vector index
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    ctx.value_store.vs = FAISS.load_local(
-        VECTOR_PATH, embeddings, allow_dangerous_deserialization=True
-    )
+    # Memory-map the value index instead of unpickling a docstore
+    ctx.value_store.load(VECTOR_PATH)
 
     return ctx
+
+
+def load_context(openai_model="gpt-4o-mini"):
+    ctx = SQLRAGContext(SQLALCHEMY_URL, openai_model)
+    ctx.value_store.embedding_cache = EmbeddingCache(
+        EMBEDDING_CACHE_PATH,
+        ttl_seconds=config.index.embedding_cache_ttl_seconds,
+        max_entries=config.index.embedding_cache_max_entries,
+    )
+    ctx.solved_store = SolvedTicketStore(
+        SOLVED_TICKETS_PATH,
+        ctx.value_store.embeddings,
+        threshold=config.solved_tickets.example_threshold,
+        embedder_id=ctx.value_store.embedding_model,
+    )
+    return _apply_snapshot(ctx)
+
+
+def _reload_context(previous, openai_model):
+    # Reuse the engine and LLM client; only the snapshot-backed stores are rebuilt
+    ctx = SQLRAGContext(
+        SQLALCHEMY_URL, openai_model, db=previous.db, llm=previous.llm
+    )
+    ctx.solved_store = previous.solved_store
+    ctx.value_store.adopt_runtime_state(previous.value_store)
+    ctx.review_stats = previous.review_stats
+    ctx.review_stats_lock = previous.review_stats_lock
+    return _apply_snapshot(ctx)
+
+
+def loaded_context(openai_model="gpt-4o-mini"):
+    """Returns the warm context only if it is already loaded; never loads or reloads"""
+    entry = _warm_contexts.get(openai_model)
+    return entry[1] if entry else None
+
+
+def get_context(openai_model="gpt-4o-mini"):
+    """Returns the process-wide warm context, reloading it if the snapshot changed"""
+    fingerprint = snapshot_fingerprint()
+
+    entry = _warm_contexts.get(openai_model)
+    if entry and entry[0] == fingerprint:
+        return entry[1]
+
+    with _warm_lock:
+        entry = _warm_contexts.get(openai_model)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+
+        if entry is None:
+            logger.info(f"Loading warm SQL context for {openai_model}")
+            ctx = load_context(openai_model)
+        else:
+            logger.info(f"Schema snapshot changed, reloading SQL context for {openai_model}")
+            try:
+                ctx = _reload_context(entry[1], openai_model)
+            except Exception as e:
+                # Snapshot may be mid-write; keep serving the previous context
+                logger.warning(f"Failed to reload SQL context, keeping previous: {e}")
+                return entry[1]
+
+        # Swap in the fully loaded context in one assignment
+        _warm_contexts[openai_model] = (fingerprint, ctx)
+        return ctx
@@ -1,13 +1,82 @@
+import threading
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 
+from core.config import config
 from logger import logger
 
+# One engine, and so one connection pool, per database URL for the whole process
+_engines = {}
+_connects = {}
+_engines_lock = threading.Lock()
+_connects_lock = threading.Lock()
+
+
+def _pool_options(url):
+    pool_config = config.database
+    options = {"pool_pre_ping": pool_config.pool_pre_ping}
+    if url.get_backend_name() != "sqlite":
+        # SQLite pools are per-thread or unbounded; sizing only applies to server databases
+        options.update(
+            pool_size=pool_config.pool_size,
+            max_overflow=pool_config.max_overflow,
+            pool_recycle=pool_config.pool_recycle,
+            pool_timeout=pool_config.pool_timeout,
+        )
+    return options
+
+
+def get_engine(database_url):
+    """Shared engine for a URL, created on first use with the configured pool settings"""
+    key = make_url(database_url).render_as_string(hide_password=False)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            url = make_url(key)
+            engine = create_engine(url, **_pool_options(url))
+            _connects[key] = 0
+
+            @event.listens_for(engine, "connect")
+            def _count_connect(dbapi_connection, connection_record):
+                # Each new DBAPI connection pays a fresh handshake
+                with _connects_lock:
+                    _connects[key] += 1
+
+            _engines[key] = engine
+            logger.info(f"Created database engine for {url.render_as_string()}")
+        return engine
+
+
+def pool_stats():
+    """Pool utilisation per engine, keyed by URL with the password hidden"""
+    stats = {}
+    for key, engine in list(_engines.items()):
+        pool = engine.pool
+        entry = {"pool": type(pool).__name__, "connects": _connects.get(key, 0)}
+        if hasattr(pool, "checkedout"):
+            size = pool.size()
+            checked_out = pool.checkedout()
+            entry.update(
+                size=size,
+                checked_out=checked_out,
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=getattr(pool, "_max_overflow", 0),
+                utilisation=checked_out / size if size else 0.0,
+            )
+        stats[make_url(key).render_as_string()] = entry
+    return stats
+
 
 class Database:
     def __init__(self, database_url):
-        self.engine = create_engine(database_url, pool_pre_ping=True)
+        self.engine = get_engine(database_url)
 
     @contextmanager
     def get_connection(self):
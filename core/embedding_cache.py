@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from logger import logger
+
+
+class EmbeddingCache:
+    def __init__(self, path, ttl_seconds=90 * 24 * 3600, max_entries=1000000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+            if "last_accessed" not in columns:
+                # Entries cached before eviction existed count as used now
+                conn.execute(
+                    "ALTER TABLE embeddings ADD COLUMN last_accessed REAL NOT NULL "
+                    f"DEFAULT {time.time()}"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_accessed "
+                "ON embeddings (last_accessed)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model, texts):
+        now = time.time()
+        hashes = {self.text_hash(t): t for t in texts}
+        found = {}
+        try:
+            with self._connect() as conn:
+                hash_list = list(hashes)
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(hash_list), 500):
+                    batch = hash_list[start : start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings "
+                        f"WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *batch],
+                    ).fetchall()
+                    for text_hash, blob in rows:
+                        found[hashes[text_hash]] = np.frombuffer(
+                            blob, dtype=np.float32
+                        ).tolist()
+                    if rows:
+                        hit_placeholders = ",".join("?" * len(rows))
+                        conn.execute(
+                            f"UPDATE embeddings SET last_accessed = ? "
+                            f"WHERE model = ? AND text_hash IN ({hit_placeholders})",
+                            [now, model, *(text_hash for text_hash, _ in rows)],
+                        )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+        return found
+
+    def put_many(self, model, vectors_by_text):
+        now = time.time()
+        rows = [
+            (model, self.text_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in vectors_by_text.items()
+        ]
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings "
+                    "(model, text_hash, vector, last_accessed) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def _evict(self, conn, now):
+        # Drop entries unused for the TTL, then least recently used beyond max_entries
+        expired = conn.execute(
+            "DELETE FROM embeddings WHERE last_accessed < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            """
+            DELETE FROM embeddings WHERE rowid IN (
+                SELECT rowid FROM embeddings
+                ORDER BY last_accessed DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        if expired or overflow:
+            logger.info(f"Evicted {expired + overflow} cached embeddings")
@@ -0,0 +1,134 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from logger import logger
+
+DEFAULT_HASHING_DIM = 384
+
+
+class LocalEmbeddings(Embeddings, ABC):
+    """CPU embedder that encodes batches in parallel threads"""
+
+    embedder_id = None
+
+    def __init__(self, batch_size=256, max_workers=4):
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    @abstractmethod
+    def _embed_batch(self, texts):
+        """Vectors for one batch, in input order"""
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        batches = [
+            texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) <= 1 or self.max_workers <= 1:
+            results = [self._embed_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # map keeps batch order
+                results = list(executor.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0]
+
+
+class HashingEmbeddings(LocalEmbeddings):
+    """Deterministic feature hashing of words and character trigrams; no model download"""
+
+    def __init__(self, dim=DEFAULT_HASHING_DIM, batch_size=256, max_workers=4):
+        super().__init__(batch_size=batch_size, max_workers=max_workers)
+        self.dim = dim
+        self.embedder_id = f"hashing:{dim}"
+
+    def _features(self, text):
+        features = []
+        for word in re.findall(r"\w+", text.lower()):
+            features.append((word, 1.0))
+            padded = f"#{word}#"
+            features += [(padded[i : i + 3], 0.5) for i in range(len(padded) - 2)]
+        return features
+
+    def _embed_batch(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = hashlib.md5(feature.encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                matrix[row, index] += weight if digest[4] & 1 else -weight
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Texts without word characters all map to the same unit vector
+        matrix[norms[:, 0] == 0, 0] = 1.0
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+@lru_cache(maxsize=None)
+def _load_sentence_transformer(model_name):
+    # Loaded once per process; context reloads reuse the same weights
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "EMBEDDING_MODEL uses sentence-transformers; install it with "
+            "'pip install sentence-transformers'"
+        ) from e
+
+    logger.info(f"Loading local embedding model {model_name}")
+    return SentenceTransformer(model_name, device="cpu")
+
+
+class SentenceTransformerEmbeddings(LocalEmbeddings):
+    """Small local model through the optional sentence-transformers package"""
+
+    def __init__(self, model_name, batch_size=256, max_workers=4):
+        super().__init__(batch_size=batch_size, max_workers=max_workers)
+        self.model = _load_sentence_transformer(model_name)
+        self.embedder_id = f"sentence-transformers:{model_name}"
+
+    def _embed_batch(self, texts):
+        return self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True
+        ).tolist()
+
+
+def embedder_id(spec):
+    """Canonical name of an embedder spec, as recorded in index manifests and caches"""
+    spec = spec.strip()
+    if spec == "hashing":
+        return f"hashing:{DEFAULT_HASHING_DIM}"
+    if spec.startswith("openai:"):
+        # Bare OpenAI model names keep existing embedding caches valid
+        return spec.split(":", 1)[1]
+    return spec
+
+
+def get_embeddings(spec, batch_size=256, max_workers=4):
+    """Embeddings for EMBEDDING_MODEL.
+
+    "hashing[:dim]" and "sentence-transformers:<model>" run locally; anything
+    else, optionally prefixed with "openai:", is an OpenAI embedding model.
+    """
+    spec = embedder_id(spec)
+    if spec.startswith("hashing:"):
+        return HashingEmbeddings(
+            int(spec.split(":", 1)[1]), batch_size=batch_size, max_workers=max_workers
+        )
+    if spec.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbeddings(
+            spec.split(":", 1)[1], batch_size=batch_size, max_workers=max_workers
+        )
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=spec)
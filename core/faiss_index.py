@@ -0,0 +1,161 @@
+import math
+import time
+
+import faiss
+import numpy as np
+
+from logger import logger
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_sq8", "ivf_pq")
+
+# Below this many vectors clustering is unreliable and a flat scan is fast anyway
+MIN_TRAINED_VECTORS = 1000
+
+
+def _nlist(n):
+    # ~4*sqrt(n) lists, with at least 39 training points per list
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_subquantizers(dim):
+    # About 8 dimensions per one-byte code, m must divide dim
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(index_type, n, dim):
+    """faiss.index_factory spec for an index type; other strings pass through unchanged"""
+    index_type = index_type.strip()
+    if index_type.lower() not in INDEX_TYPES:
+        return index_type
+
+    index_type = index_type.lower()
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return "HNSW32"
+    if n < MIN_TRAINED_VECTORS:
+        logger.info(f"Only {n} vectors, using a flat index instead of {index_type}")
+        return "Flat"
+
+    nlist = _nlist(n)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_sq8":
+        return f"IVF{nlist},SQ8"
+    return f"IVF{nlist},PQ{_pq_subquantizers(dim)}"
+
+
+def build_empty_index(vectors, index_type="flat", train_size=50000, seed=0):
+    """Trained, empty index of the configured type for the given vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    spec = factory_string(index_type, n, dim)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if n > train_size:
+            sample = vectors[rng.choice(n, size=train_size, replace=False)]
+        start = time.perf_counter()
+        index.train(sample)
+        logger.info(
+            f"Trained {spec} on {len(sample)} vectors in {time.perf_counter() - start:.2f}s"
+        )
+    return index
+
+
+def base_index(index):
+    """Unwraps an id map to the index that stores the vectors"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def is_flat(index):
+    return isinstance(base_index(index), faiss.IndexFlat)
+
+
+def tune_index(index, nprobe=None, ef_search=None):
+    """Sets whichever search-time parameters the index supports"""
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if value is None:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            # Parameter does not apply to this index type
+            pass
+
+
+def recall_report(
+    vectors,
+    index_types=INDEX_TYPES,
+    nprobes=(1, 4, 16, 64),
+    ef_searches=(16, 64, 256),
+    k=30,
+    n_queries=200,
+    train_size=50000,
+    seed=0,
+):
+    """Recall@k and per-query latency of each index setting against exact search"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    n_queries = min(n_queries, max(1, len(vectors) // 10))
+
+    # Held-out queries so no query finds itself
+    order = rng.permutation(len(vectors))
+    queries, base = vectors[order[:n_queries]], vectors[order[n_queries:]]
+    k = min(k, len(base))
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_empty_index(base, index_type, train_size=train_size, seed=seed)
+        index.add(base)
+        build_seconds = time.perf_counter() - start
+        size_bytes = len(faiss.serialize_index(index))
+
+        if "IVF" in factory_string(index_type, len(base), base.shape[1]):
+            settings = [{"nprobe": p} for p in nprobes]
+        elif isinstance(index, faiss.IndexHNSW):
+            settings = [{"ef_search": e} for e in ef_searches]
+        else:
+            settings = [{}]
+
+        for setting in settings:
+            tune_index(index, **setting)
+            latencies = []
+            found = []
+            for q in queries:
+                start = time.perf_counter()
+                _, ids = index.search(q.reshape(1, -1), k)
+                latencies.append(time.perf_counter() - start)
+                found.append(ids[0])
+
+            recall = float(
+                np.mean(
+                    [len(set(f) & set(t)) / k for f, t in zip(found, truth)]
+                )
+            )
+            rows.append(
+                {
+                    "index_type": index_type,
+                    "factory": factory_string(index_type, len(base), base.shape[1]),
+                    **setting,
+                    "recall_at_k": recall,
+                    "mean_latency_ms": float(np.mean(latencies) * 1000),
+                    "p95_latency_ms": float(np.percentile(latencies, 95) * 1000),
+                    "build_seconds": build_seconds,
+                    "size_bytes": size_bytes,
+                }
+            )
+    return {"vectors": len(base), "queries": len(queries), "k": k, "results": rows}
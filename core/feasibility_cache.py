@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from logger import logger
+
+
+class FeasibilityCache:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feasibility_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    issue_key TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(issue, model, prompt_version):
+        content = f"{issue.fields.summary}\n{issue.fields.description or ''}"
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        updated = getattr(issue.fields, "updated", None) or ""
+        raw = "|".join([issue.key, updated, content_hash, model, prompt_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT result, created_at FROM feasibility_cache WHERE cache_key = ?",
+                    (cache_key,),
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    conn.execute(
+                        "UPDATE feasibility_cache SET last_accessed = ? WHERE cache_key = ?",
+                        (now, cache_key),
+                    )
+                    with self._lock:
+                        self.hits += 1
+                    return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Feasibility cache read failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, cache_key, issue_key, result):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO feasibility_cache VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, issue_key, json.dumps(result), now, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Feasibility cache write failed: {e}")
+
+    def _evict(self, conn, now):
+        conn.execute(
+            "DELETE FROM feasibility_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,),
+        )
+        conn.execute(
+            """
+            DELETE FROM feasibility_cache WHERE cache_key IN (
+                SELECT cache_key FROM feasibility_cache
+                ORDER BY last_accessed DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        try:
+            with self._connect() as conn:
+                entries = conn.execute(
+                    "SELECT COUNT(*) FROM feasibility_cache"
+                ).fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
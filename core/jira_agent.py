@@ -4,18 +4,54 @@ import openai
 from jira import JIRA
 from openai import OpenAIError
 
+from core.telemetry import telemetry
 from logger import logger
 from utils.jira_utils import JiraUtils
 
+# Bump when the feasibility prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
 
 class JiraAgent:
-    def __init__(self, jira_client: JIRA, project_key, openai_api_key, openai_model):
+    def __init__(
+        self,
+        jira_client: JIRA,
+        project_key,
+        openai_api_key,
+        openai_model,
+        request_timeout=60,
+        cache=None,
+    ):
         self.jira = jira_client
         self.jira_project_key = project_key
         self.openai_api_key = openai_api_key
         self.openai_model = openai_model
+        self.request_timeout = request_timeout
+        self.cache = cache
+
+    @staticmethod
+    def fallback_analysis(issue, reasoning):
+        return {
+            "issue_key": issue.key,
+            "summary": issue.fields.summary,
+            "feasible": False,
+            "confidence": "Low",
+            "complexity_score": 0,
+            "reasoning": reasoning,
+            "missing_information": [],
+            "potential_risks": [],
+        }
 
     def analyse_issues(self, issue):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(issue, self.openai_model, PROMPT_VERSION)
+            cached = self.cache.get(cache_key)
+            telemetry.record(cache_hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Feasibility cache hit for {issue.key}")
+                return cached
+
         formatted_issue = JiraUtils.format_issue(issue)
 
         prompt = f"""
@@ -76,30 +112,30 @@ class JiraAgent:
             that involves extracting and/or transforming data from SQL databases.
         """
 
-        client = openai.Client(api_key=self.openai_api_key)
+        client = openai.Client(
+            api_key=self.openai_api_key, timeout=self.request_timeout
+        )
 
         try:
-            response = client.chat.completions.create(
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": role_prompt},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0,
-                max_tokens=2000,
-                response_format={"type": "json_object"},
-            )
+            with telemetry.span("feasibility_llm", model=self.openai_model) as span:
+                response = client.chat.completions.create(
+                    model=self.openai_model,
+                    messages=[
+                        {"role": "system", "content": role_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0,
+                    max_tokens=2000,
+                    response_format={"type": "json_object"},
+                )
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    span["prompt_tokens"] = usage.prompt_tokens
+                    span["completion_tokens"] = usage.completion_tokens
             result = json.loads(response.choices[0].message.content)
+            if cache_key is not None:
+                self.cache.put(cache_key, issue.key, result)
             return result
 
         except OpenAIError as e:
-            return {
-                "issue_key": issue.key,
-                "summary": issue.fields.summary,
-                "feasible": False,
-                "confidence": "Low",
-                "complexity_score": 0,
-                "reasoning": f"OpenAI API Error: {e}",
-                "missing_information": [],
-                "potential_risks": [],
-            }
+            return self.fallback_analysis(issue, f"OpenAI API Error: {e}")
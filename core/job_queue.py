@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from logger import logger
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobQueue:
+    def __init__(self, path, max_workers=4):
+        self.path = path
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    issue_key TEXT,
+                    state TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    latency_seconds REAL
+                )
+                """
+            )
+            # Work owned by a previous process will never finish
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', error = 'Interrupted by restart', "
+                "finished_at = ? WHERE state IN ('queued', 'running')",
+                (time.time(),),
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind, issue_key=None, payload=None):
+        """Queues a job, or returns the id of the same kind of job already active for the issue"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        if issue_key is not None:
+            active = self.latest_job(issue_key, kind)
+            if active and active["state"] in ACTIVE_STATES:
+                return active["job_id"]
+
+        payload = payload or {}
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, issue_key, state, payload, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, issue_key, json.dumps(payload), time.time()),
+            )
+        self._executor.submit(self._run, job_id, kind, payload)
+        logger.info(f"Queued {kind} job {job_id} for {issue_key}")
+        return job_id
+
+    def _run(self, job_id, kind, payload):
+        started_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'running', started_at = ? WHERE job_id = ?",
+                (started_at, job_id),
+            )
+
+        state, result, error = "succeeded", None, None
+        try:
+            result = json.dumps(self._handlers[kind](**payload), default=str)
+        except Exception as e:
+            state, error = "failed", str(e)
+            logger.error(f"{kind} job {job_id} failed: {e}", exc_info=True)
+
+        finished_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ?, "
+                "latency_seconds = ? WHERE job_id = ?",
+                (state, result, error, finished_at, finished_at - started_at, job_id),
+            )
+        logger.info(f"{kind} job {job_id} {state} in {finished_at - started_at:.2f}s")
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def latest_job(self, issue_key, kind=None):
+        sql = "SELECT * FROM jobs WHERE issue_key = ?"
+        params = [issue_key]
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY created_at DESC LIMIT 1"
+        with self._connect() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return self._to_dict(row) if row else None
+
+    def recent_jobs(self, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(path, max_workers=4):
+    """Process-wide queue, so jobs keep running across Streamlit reruns"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(path, max_workers=max_workers)
+        return _job_queue
@@ -0,0 +1,140 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+# Codes such as AB-1234 or v2.1 are also indexed whole
+_COMPOUND = re.compile(r"\w+(?:[-./]\w+)+")
+
+# Shorter values (e.g. "a", "1") match too much text to count as exact
+MIN_EXACT_CHARS = 3
+# Single words shorter than this (e.g. "open") are too common to skip the embedding call
+MIN_STRONG_CHARS = 8
+
+
+def words(text):
+    return _WORD.findall(text.lower())
+
+
+def phrase(text):
+    return " ".join(words(text))
+
+
+def is_strong_phrase(value_phrase):
+    """Multi-word or long values that a ticket is unlikely to contain by accident"""
+    return " " in value_phrase or len(value_phrase) >= MIN_STRONG_CHARS
+
+
+def tokenize(text):
+    return words(text) + _COMPOUND.findall(text.lower())
+
+
+class LexicalIndex:
+    """BM25 inverted index over the sampled values, row-aligned with ValueIndex"""
+
+    def __init__(self, vocabulary, offsets, rows, tfs, lengths, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(np.mean(lengths)) if len(lengths) else 0.0
+
+    @classmethod
+    def build(cls, values):
+        postings = defaultdict(list)
+        lengths = np.zeros(len(values), dtype=np.uint16)
+        for row, value in enumerate(values):
+            counts = Counter(tokenize(value))
+            lengths[row] = min(sum(counts.values()), np.iinfo(np.uint16).max)
+            for token, tf in counts.items():
+                postings[token].append((row, tf))
+
+        tokens = sorted(postings)
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        for i, token in enumerate(tokens):
+            offsets[i + 1] = offsets[i] + len(postings[token])
+
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, token in enumerate(tokens):
+            start, end = offsets[i], offsets[i + 1]
+            rows[start:end] = [r for r, _ in postings[token]]
+            tfs[start:end] = [tf for _, tf in postings[token]]
+
+        return cls({t: i for i, t in enumerate(tokens)}, offsets, rows, tfs, lengths)
+
+    @staticmethod
+    def exists(path):
+        return os.path.isfile(os.path.join(path, "lexical_vocab.json"))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "lexical_vocab.json"), "r") as f:
+            tokens = json.load(f)
+        mode = "r" if mmap else None
+        return cls(
+            {t: i for i, t in enumerate(tokens)},
+            np.load(os.path.join(path, "lexical_offsets.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "lexical_rows.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "lexical_tfs.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "lexical_lengths.npy"), mmap_mode=mode),
+        )
+
+    def save(self, path):
+        tokens = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(os.path.join(path, "lexical_vocab.json"), "w") as f:
+            json.dump(tokens, f)
+        np.save(os.path.join(path, "lexical_offsets.npy"), np.asarray(self.offsets))
+        np.save(os.path.join(path, "lexical_rows.npy"), np.asarray(self.rows))
+        np.save(os.path.join(path, "lexical_tfs.npy"), np.asarray(self.tfs))
+        np.save(os.path.join(path, "lexical_lengths.npy"), np.asarray(self.lengths))
+
+    def search(self, text, value_of, k=30):
+        """Top rows by BM25 as (row, score, exact); exact means the value appears verbatim"""
+        n = len(self.lengths)
+        if n == 0:
+            return []
+
+        row_parts, weight_parts = [], []
+        for token in set(tokenize(text)):
+            position = self.vocabulary.get(token)
+            if position is None:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            rows = np.asarray(self.rows[start:end])
+            tfs = np.asarray(self.tfs[start:end], dtype=np.float32)
+            lengths = np.asarray(self.lengths[rows], dtype=np.float32)
+
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_length)
+            row_parts.append(rows)
+            weight_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not row_parts:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+
+        # Exact checks only on the best candidates; verbatim values score highest anyway
+        limit = min(len(candidates), k * 10)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        query = f" {' '.join(words(text))} "
+
+        hits = []
+        for i in top:
+            row = int(candidates[i])
+            value_phrase = phrase(value_of(row))
+            exact = len(value_phrase) >= MIN_EXACT_CHARS and f" {value_phrase} " in query
+            hits.append((row, float(scores[i]), exact))
+
+        hits.sort(key=lambda h: (not h[2], -h[1]))
+        return hits[:k]
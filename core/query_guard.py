@@ -0,0 +1,93 @@
+import json
+
+from sqlalchemy import text
+
+from logger import logger
+
+
+class QueryGuard:
+    def __init__(self, max_cost=1e6, max_rows=1e7, block=True, statement_timeout_ms=60000):
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.block = block
+        self.statement_timeout_ms = statement_timeout_ms
+
+    @staticmethod
+    def is_postgres(conn):
+        return conn.dialect.name == "postgresql"
+
+    def begin_read_only(self, conn):
+        """Must run first inside the transaction that executes the generated SQL"""
+        if not self.is_postgres(conn):
+            return
+        conn.execute(text("SET TRANSACTION READ ONLY"))
+        conn.execute(
+            text(f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}")
+        )
+
+    @staticmethod
+    def _walk(plan):
+        yield plan
+        for child in plan.get("Plans", []):
+            yield from QueryGuard._walk(child)
+
+    def explain(self, conn, sql_query):
+        if not self.is_postgres(conn):
+            return {
+                "verdict": "ok",
+                "reasons": ["Cost check skipped: EXPLAIN (FORMAT JSON) needs PostgreSQL"],
+            }
+
+        # VERBOSE adds the schema of each scanned relation
+        raw = conn.execute(text(f"EXPLAIN (FORMAT JSON, VERBOSE) {sql_query}")).scalar()
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        plan = raw[0]["Plan"]
+
+        seq_scans = sorted(
+            {
+                node.get("Relation Name")
+                for node in self._walk(plan)
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name")
+            }
+        )
+
+        # Tables the query reads, with views already expanded by the planner
+        relations = sorted(
+            {
+                (node.get("Schema"), node["Relation Name"])
+                for node in self._walk(plan)
+                if node.get("Relation Name")
+            },
+            key=lambda r: (r[0] or "", r[1]),
+        )
+
+        summary = {
+            "node_type": plan.get("Node Type"),
+            "total_cost": plan.get("Total Cost"),
+            "plan_rows": plan.get("Plan Rows"),
+            "seq_scans": seq_scans,
+            "relations": [list(r) for r in relations],
+        }
+
+        reasons = []
+        if summary["total_cost"] is not None and summary["total_cost"] > self.max_cost:
+            reasons.append(
+                f"Estimated cost {summary['total_cost']:,.0f} exceeds limit {self.max_cost:,.0f}"
+            )
+        if summary["plan_rows"] is not None and summary["plan_rows"] > self.max_rows:
+            reasons.append(
+                f"Estimated rows {summary['plan_rows']:,} exceed limit {self.max_rows:,.0f}"
+            )
+
+        if not reasons:
+            summary["verdict"] = "ok"
+        else:
+            summary["verdict"] = "block" if self.block else "warn"
+        summary["reasons"] = reasons
+
+        logger.info(
+            f"Query plan: cost={summary['total_cost']} rows={summary['plan_rows']} "
+            f"seq_scans={seq_scans} verdict={summary['verdict']}"
+        )
+        return summary
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from logger import logger
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024, ttl_seconds=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.index_path = os.path.join(directory, "index.sqlite")
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    cache_key TEXT PRIMARY KEY,
+                    row_count INTEGER NOT NULL,
+                    truncated INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    posted_to TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize_sql(sql_query):
+        """Collapses whitespace and case outside quoted literals and identifiers"""
+        parts = _QUOTED.split(sql_query.strip().rstrip(";"))
+        for i in range(0, len(parts), 2):
+            parts[i] = re.sub(r"\s+", " ", parts[i]).lower()
+        return "".join(parts).strip()
+
+    @staticmethod
+    def make_key(sql_query, freshness_token="", limits=()):
+        # Limits are part of the key: a truncated export must not answer a larger request
+        limit_part = ":".join(str(limit) for limit in limits)
+        raw = f"{ResultCache.normalize_sql(sql_query)}\x1f{freshness_token}\x1f{limit_part}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, cache_key):
+        return os.path.join(self.directory, f"{cache_key}.csv.gz")
+
+    def export_path(self):
+        """Fresh file inside the cache directory, so put() renames instead of copying"""
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=".export-", suffix=".csv.gz")
+        os.close(fd)
+        return path
+
+    def get(self, cache_key):
+        now = time.time()
+        path = self.path_for(cache_key)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT row_count, truncated, posted_to, created_at FROM results WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[3] > self.ttl_seconds or not os.path.exists(path):
+                self._remove(conn, cache_key)
+                return None
+            conn.execute(
+                "UPDATE results SET last_accessed = ? WHERE cache_key = ?",
+                (now, cache_key),
+            )
+        return {
+            "path": path,
+            "row_count": row[0],
+            "truncated": bool(row[1]),
+            "posted_to": json.loads(row[2]),
+        }
+
+    def put(self, cache_key, source_path, row_count, truncated):
+        """Moves the exported file into the cache; returns the entry, or None if too large"""
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return None
+
+        now = time.time()
+        path = self.path_for(cache_key)
+        # Falls back to a copy when the export was written on another filesystem
+        shutil.move(source_path, path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, row_count, int(truncated), size, "[]", now, now),
+            )
+            self._evict(conn, keep=cache_key)
+        return {"path": path, "row_count": row_count, "truncated": truncated, "posted_to": []}
+
+    def mark_posted(self, cache_key, issue_key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT posted_to FROM results WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return
+            posted_to = sorted(set(json.loads(row[0])) | {issue_key})
+            conn.execute(
+                "UPDATE results SET posted_to = ? WHERE cache_key = ?",
+                (json.dumps(posted_to), cache_key),
+            )
+
+    def _remove(self, conn, cache_key):
+        conn.execute("DELETE FROM results WHERE cache_key = ?", (cache_key,))
+        try:
+            os.remove(self.path_for(cache_key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, conn, keep):
+        # Least recently used first until the cache fits in max_bytes
+        rows = conn.execute(
+            "SELECT cache_key, size_bytes FROM results ORDER BY last_accessed ASC"
+        ).fetchall()
+        total = sum(size for _, size in rows)
+        for cache_key, size in rows:
+            if total <= self.max_bytes:
+                break
+            if cache_key == keep:
+                continue
+            self._remove(conn, cache_key)
+            total -= size
+            logger.info(f"Evicted cached result {cache_key[:12]} ({size} bytes)")
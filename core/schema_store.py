@@ -1,29 +1,248 @@
-from collections import defaultdict
+import hashlib
+import threading
+import time
+from collections import deque
 
 from langchain_community.utilities import SQLDatabase
 from sqlalchemy import text
 
+from logger import logger
+from utils.token_utils import count_tokens
+
 
 class SchemaStore:
-    def __init__(self, db: SQLDatabase, schema="public"):
+    def __init__(self, db: SQLDatabase, schema="public", fingerprint_check_interval=300):
         self.db = db
         self.schema = schema
+        self.fingerprint_check_interval = fingerprint_check_interval
 
-    def fetch_schema(self):
+        self._lock = threading.Lock()
+        self._rows = None
+        self._by_table = {}
+        self._by_column = {}
+        self._foreign_keys = {}
+        self._neighbours = {}
+        self._full_schema_cache = {}
+        self._fingerprint = None
+        self._from_snapshot = False
+        self._last_checked = 0.0
+
+    @staticmethod
+    def compute_fingerprint(schema_rows):
+        # Same formula as the md5(string_agg(...)) in _query_fingerprint
+        joined = ",".join(f"{r['table']}.{r['column']}:{r['type']}" for r in schema_rows)
+        return hashlib.md5(joined.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def table_fingerprints(schema_rows):
+        """md5 per table of its columns, types and keys, in ordinal order"""
+        columns = {}
+        for r in schema_rows:
+            col = f"{r['column']}:{r['type']}"
+            if r.get("primary_key"):
+                col += ":pk"
+            if r.get("references"):
+                col += f":{r['references']['table']}.{r['references']['column']}"
+            columns.setdefault(r["table"], []).append(col)
+        return {
+            table: hashlib.md5(",".join(cols).encode("utf-8")).hexdigest()
+            for table, cols in columns.items()
+        }
+
+    @classmethod
+    def snapshot_fingerprint(cls, schema_rows):
+        """Overall and per-table fingerprints, as stored next to the schema snapshot"""
+        tables = cls.table_fingerprints(schema_rows)
+        joined = ",".join(f"{t}:{tables[t]}" for t in sorted(tables))
+        return {
+            "fingerprint": hashlib.md5(joined.encode("utf-8")).hexdigest(),
+            "tables": tables,
+        }
+
+    @staticmethod
+    def diff_schemas(old_rows, new_rows):
+        """Added, dropped and retyped columns between two schema snapshots.
+
+        changed_tables lists surviving tables whose columns differ, new tables included.
+        """
+        old = {(r["table"], r["column"]): r["type"] for r in old_rows}
+        new = {(r["table"], r["column"]): r["type"] for r in new_rows}
+        old_tables = {t for t, _ in old}
+        new_tables = {t for t, _ in new}
+        added = new.keys() - old.keys()
+        dropped = old.keys() - new.keys()
+        retyped = {k for k in old.keys() & new.keys() if old[k] != new[k]}
+        return {
+            "added_tables": sorted(new_tables - old_tables),
+            "dropped_tables": sorted(old_tables - new_tables),
+            "added_columns": sorted(f"{t}.{c}" for t, c in added),
+            "dropped_columns": sorted(f"{t}.{c}" for t, c in dropped),
+            "retyped_columns": sorted(
+                f"{t}.{c}: {old[(t, c)]} -> {new[(t, c)]}" for t, c in retyped
+            ),
+            "changed_tables": sorted(
+                {t for t, _ in added | dropped | retyped} & new_tables
+            ),
+        }
+
+    def _build_index(self, schema_rows):
+        by_table, by_column, foreign_keys, neighbours = {}, {}, {}, {}
+        for r in schema_rows:
+            by_table.setdefault(r["table"], []).append(r)
+            by_column[(r["table"], r["column"])] = r
+            if r.get("references"):
+                ref_table = r["references"]["table"]
+                foreign_keys.setdefault(r["table"], []).append(
+                    (r["column"], ref_table, r["references"]["column"])
+                )
+                # Joins work in both directions
+                neighbours.setdefault(r["table"], set()).add(ref_table)
+                neighbours.setdefault(ref_table, set()).add(r["table"])
+
+        # Swap everything in together so readers never see a half-built index
+        self._rows = schema_rows
+        self._by_table = by_table
+        self._by_column = by_column
+        self._foreign_keys = foreign_keys
+        self._neighbours = neighbours
+        self._full_schema_cache = {}
+        self._fingerprint = self.compute_fingerprint(schema_rows)
+        self._last_checked = time.monotonic()
 
-        sql = f"""
+    def load_snapshot(self, schema_rows):
+        """Serves schema lookups from a saved snapshot instead of the database"""
+        with self._lock:
+            self._from_snapshot = True
+            self._build_index(schema_rows)
+
+    def refresh(self):
+        schema_rows = self._query_schema()
+        with self._lock:
+            if schema_rows is None:
+                # Keep serving the previous index when the database is unreachable
+                if self._rows is None:
+                    self._build_index([])
+                self._last_checked = time.monotonic()
+                return
+            self._from_snapshot = False
+            self._build_index(schema_rows)
+
+    def _query_schema(self):
+        sql = """
         SELECT table_name, column_name, data_type
         FROM information_schema.columns
-        WHERE table_schema = '{self.schema}'
+        WHERE table_schema = :schema
         ORDER BY table_name, ordinal_position;
         """
         try:
             with self.db._engine.connect() as conn:
-                rows = conn.execute(text(sql)).fetchall()
-            return [{"table": r[0], "column": r[1], "type": r[2]} for r in rows]
-        except Exception:
+                rows = conn.execute(text(sql), {"schema": self.schema}).fetchall()
+        except Exception as e:
+            logger.warning(f"Failed to fetch schema: {e}")
+            return None
+
+        schema_rows = [
+            {
+                "table": r[0],
+                "column": r[1],
+                "type": r[2],
+                "primary_key": False,
+                "references": None,
+            }
+            for r in rows
+        ]
+
+        by_column = {(r["table"], r["column"]): r for r in schema_rows}
+        for table, column, constraint_type, ref_table, ref_column in self._query_keys():
+            row = by_column.get((table, column))
+            if row is None:
+                continue
+            if constraint_type == "PRIMARY KEY":
+                row["primary_key"] = True
+            elif ref_table and ref_column:
+                row["references"] = {"table": ref_table, "column": ref_column}
+
+        return schema_rows
+
+    def _query_keys(self):
+        sql = """
+        SELECT kcu.table_name, kcu.column_name, tc.constraint_type,
+               ccu.table_name, ccu.column_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+          ON tc.constraint_name = kcu.constraint_name
+         AND tc.table_schema = kcu.table_schema
+        LEFT JOIN information_schema.constraint_column_usage ccu
+          ON tc.constraint_type = 'FOREIGN KEY'
+         AND tc.constraint_name = ccu.constraint_name
+         AND tc.table_schema = ccu.table_schema
+        WHERE tc.table_schema = :schema
+          AND tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY');
+        """
+        try:
+            with self.db._engine.connect() as conn:
+                return conn.execute(text(sql), {"schema": self.schema}).fetchall()
+        except Exception as e:
+            logger.warning(f"Failed to fetch key constraints: {e}")
             return []
 
+    def _query_fingerprint(self):
+        sql = """
+        SELECT md5(string_agg(
+            table_name || '.' || column_name || ':' || data_type, ','
+            ORDER BY table_name, ordinal_position
+        ))
+        FROM information_schema.columns
+        WHERE table_schema = :schema;
+        """
+        with self.db._engine.connect() as conn:
+            return conn.execute(text(sql), {"schema": self.schema}).scalar()
+
+    def _ensure_index(self):
+        if self._rows is None:
+            self.refresh()
+            return
+
+        if self._from_snapshot:
+            return
+
+        if time.monotonic() - self._last_checked < self.fingerprint_check_interval:
+            return
+
+        try:
+            fingerprint = self._query_fingerprint()
+        except Exception as e:
+            logger.warning(f"Schema fingerprint check failed: {e}")
+            self._last_checked = time.monotonic()
+            return
+
+        if fingerprint != self._fingerprint:
+            logger.info("Schema fingerprint changed, refreshing schema index")
+            self.refresh()
+        else:
+            self._last_checked = time.monotonic()
+
+    def fetch_schema(self):
+        self._ensure_index()
+        return self._rows
+
+    def tables(self):
+        self._ensure_index()
+        return list(self._by_table)
+
+    def columns_for_table(self, table):
+        self._ensure_index()
+        return self._by_table.get(table, [])
+
+    def get_column(self, table, column):
+        self._ensure_index()
+        return self._by_column.get((table, column))
+
+    def foreign_keys_for_table(self, table):
+        """Returns [(column, referenced table, referenced column)] for a table"""
+        self._ensure_index()
+        return self._foreign_keys.get(table, [])
+
     def text_like_columns(self, schema_rows):
         if schema_rows is None:
             schema_rows = self.fetch_schema()
@@ -38,15 +257,77 @@ class SchemaStore:
         return sorted({t for t, _ in cols})
 
     def compact_schema_for_tables(self, tables):
-        all_rows = self.fetch_schema()
-        by_table = defaultdict(list)
-        for r in all_rows:
-            if r["table"] in tables:
-                by_table[r["table"]].append(f"{r['column']} ({r['type']})")
+        self._ensure_index()
         summary_lines = []
-        for t in sorted(by_table.keys()):
-            cols = ", ".join(by_table[t][:20])
-            if len(by_table[t]) > 20:
-                cols += f", … (+{len(by_table[t])-20} more)"
+        for t in sorted(set(tables)):
+            rows = self._by_table.get(t)
+            if not rows:
+                continue
+            cols = ", ".join(f"{r['column']} ({r['type']})" for r in rows[:20])
+            if len(rows) > 20:
+                cols += f", … (+{len(rows)-20} more)"
             summary_lines.append(f"- {t}: {cols}")
         return "\n".join(summary_lines)
+
+    def serialize_tables(self, tables):
+        """One line per table: table(column type, ...) with PK and FK markers"""
+        self._ensure_index()
+        lines = []
+        for t in tables:
+            cols = []
+            for r in self._by_table.get(t, []):
+                col = f"{r['column']} {r['type']}"
+                if r.get("primary_key"):
+                    col += " PK"
+                if r.get("references"):
+                    col += f" -> {r['references']['table']}.{r['references']['column']}"
+                cols.append(col)
+            if cols:
+                lines.append(f"{t}({', '.join(cols)})")
+        return "\n".join(lines)
+
+    def tables_by_fk_distance(self, seed_tables):
+        """Seed tables first, then their FK neighbourhood in breadth-first order"""
+        self._ensure_index()
+        ordered = [t for t in dict.fromkeys(seed_tables) if t in self._by_table]
+        seen = set(ordered)
+        queue = deque(ordered)
+        while queue:
+            table = queue.popleft()
+            for neighbour in sorted(self._neighbours.get(table, ())):
+                if neighbour not in seen and neighbour in self._by_table:
+                    seen.add(neighbour)
+                    ordered.append(neighbour)
+                    queue.append(neighbour)
+        return ordered
+
+    def schema_prompt(self, seed_tables, token_budget, model="gpt-4o"):
+        """Compact schema for the prompt, pruned around seed_tables to fit token_budget"""
+        self._ensure_index()
+        if model not in self._full_schema_cache:
+            full_schema = self.serialize_tables(sorted(self._by_table))
+            self._full_schema_cache[model] = (full_schema, count_tokens(full_schema, model))
+        full_schema, full_tokens = self._full_schema_cache[model]
+        if full_tokens <= token_budget:
+            logger.info(f"Schema prompt: {full_tokens} tokens (full schema)")
+            return full_schema
+
+        candidates = self.tables_by_fk_distance(seed_tables) or sorted(self._by_table)
+        lines, used = [], 0
+        for table in candidates:
+            line = self.serialize_tables([table])
+            tokens = count_tokens(line, model)
+            if used + tokens > token_budget:
+                if not lines:
+                    # Always keep the best match even if it alone exceeds the budget
+                    lines.append(line)
+                    used += tokens
+                continue
+            lines.append(line)
+            used += tokens
+
+        logger.info(
+            f"Schema prompt: {used} tokens used, {full_tokens - used} tokens saved "
+            f"({len(lines)} of {len(self._by_table)} tables)"
+        )
+        return "\n".join(lines)
@@ -1,17 +1,40 @@
 import os
-import tempfile
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import pandas as pd
 from sqlalchemy import text
 
-from core.config import SQLALCHEMY_URL, Config
-from core.context_loader import load_context
-from core.database_connector import Database
+from core.config import (
+    FEASIBILITY_CACHE_PATH,
+    JOBS_DB_PATH,
+    RESULT_CACHE_DIR,
+    SQLALCHEMY_URL,
+    Config,
+)
+from core.database_connector import Database, pool_stats
+from core.feasibility_cache import FeasibilityCache
 from core.jira_agent import JiraAgent
+from core.job_queue import get_job_queue
 from core.jira_connector import JiraConnector
-from core.sql_rag_agent import SQLRAGAgent, SQLRAGContext
+from core.query_guard import QueryGuard
+from core.result_cache import ResultCache
+from core.telemetry import telemetry
 from logger import logger
-from utils.jira_utils import JiraUtils
+from utils.export_utils import stream_result_to_csv_gz
+from utils.jira_utils import ISSUE_FIELDS, JiraUtils
+
+
+def get_context(openai_model):
+    # Imported on first use: the SQL context pulls in langchain, FAISS and the embedder
+    from core.context_loader import get_context as get_warm_context
+
+    return get_warm_context(openai_model)
+
+
+def get_loaded_context(openai_model):
+    # Nothing can be loaded if the context loader was never imported
+    loader = sys.modules.get("core.context_loader")
+    return loader.loaded_context(openai_model) if loader else None
 
 
 class Services:
@@ -19,77 +42,318 @@ class Services:
         self.config = config
         self.openai_model = config.openai.openai_model
         self.jira_client = JiraConnector(config.jira).get_jira_connection()
-        self.jira_utils = JiraUtils(self.jira_client, config.jira.jira_project_key)
+        if self.jira_client is None:
+            # Raise rather than return a Services that the dashboard would cache without Jira
+            raise ConnectionError("Could not connect to Jira; check JIRA_URL and credentials")
+        self.jira_utils = JiraUtils(
+            self.jira_client,
+            config.jira.jira_project_key,
+            page_size=config.jira.page_size,
+            max_issues=config.jira.max_issues,
+            max_workers=config.jira.fetch_workers,
+        )
+        self.feasibility_cache = FeasibilityCache(
+            FEASIBILITY_CACHE_PATH,
+            ttl_seconds=config.analysis.cache_ttl_seconds,
+            max_entries=config.analysis.cache_max_entries,
+        )
         self.jira_agent = JiraAgent(
             self.jira_client,
             config.jira.jira_project_key,
             config.openai.openai_api_key,
             config.openai.openai_model,
+            request_timeout=config.analysis.request_timeout,
+            cache=self.feasibility_cache,
         )
         self.db = Database(SQLALCHEMY_URL)
-        self.sql_agent = SQLRAGAgent(SQLRAGContext(SQLALCHEMY_URL, self.openai_model))
+        self.query_guard = QueryGuard(
+            max_cost=config.query_guard.max_cost,
+            max_rows=config.query_guard.max_rows,
+            block=config.query_guard.block,
+            statement_timeout_ms=config.query_guard.statement_timeout_ms,
+        )
+        self.result_cache = ResultCache(
+            RESULT_CACHE_DIR,
+            max_bytes=config.result_cache.max_bytes,
+            ttl_seconds=config.result_cache.ttl_seconds,
+        )
+        self.job_queue = get_job_queue(JOBS_DB_PATH, max_workers=config.jobs.max_workers)
+        self.job_queue.register("sql_task", self.run_sql_task)
+        self.job_queue.register("execute", self.execute_sql_and_post)
+
+    def _agent(self, ctx):
+        from core.sql_rag_agent import SQLRAGAgent
+
+        return SQLRAGAgent(ctx, query_guard=self.query_guard)
+
+    @property
+    def sql_agent(self):
+        # Feedback updates share the warm, snapshot-backed context with run_sql_task
+        return self._agent(get_context(self.openai_model))
 
     def analyse_issue_feasibility(self):
+        results = {}
+        for index, analysis in self.iter_issue_feasibility():
+            results[index] = analysis
 
-        issues = self.jira_utils.get_issues("To Do")
+        # Keep the Jira ordering regardless of completion order
+        return [results[index] for index in sorted(results)]
 
-        results = []
-        for issue in issues:
-            analysis = self.jira_agent.analyse_issues(issue)
-            results.append(analysis)
+    def iter_issue_feasibility(self, issues=None):
+        """Yields (position, analysis) pairs as each issue's analysis completes"""
+        if issues is None:
+            issues = self.jira_utils.get_issues("To Do")
 
-        return results
+        if not issues:
+            return
 
-    def run_sql_task(self, issue_key):
+        max_workers = max(1, min(self.config.analysis.max_workers, len(issues)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._traced_feasibility, issue): (index, issue)
+                for index, issue in enumerate(issues)
+            }
+            for future in as_completed(futures):
+                index, issue = futures[future]
+                try:
+                    analysis = future.result()
+                except Exception as e:
+                    logger.error(f"Feasibility analysis failed for {issue.key}: {e}")
+                    analysis = self.jira_agent.fallback_analysis(
+                        issue, f"Analysis failed: {e}"
+                    )
+                yield index, analysis
+
+    def _traced_feasibility(self, issue):
+        with telemetry.trace("feasibility", issue.key):
+            return self.jira_agent.analyse_issues(issue)
+
+    def get_feasibility_cache_stats(self):
+        return self.feasibility_cache.stats()
+
+    def enqueue_sql_task(self, issue_key):
+        return self.job_queue.enqueue("sql_task", issue_key, {"issue_key": issue_key})
+
+    def enqueue_execute_sql(self, issue_key, sql_query):
+        return self.job_queue.enqueue(
+            "execute", issue_key, {"issue_key": issue_key, "sql_query": sql_query}
+        )
 
-        issue = self.jira_client.issue(issue_key)
-        self.jira_utils.assign_to_self(issue_key)
-        self.jira_utils.progress_ticket(issue_key)
+    def run_sql_task(self, issue_key):
+        with telemetry.trace("sql_task", issue_key):
+            with telemetry.span("jira_update"):
+                issue = self.jira_client.issue(issue_key, fields=",".join(ISSUE_FIELDS))
+                self.jira_utils.assign_to_self(issue_key)
+                self.jira_utils.progress_ticket(issue_key)
 
-        # Generate SQL
-        ctx = load_context(self.openai_model)
-        agent = SQLRAGAgent(ctx)
-        sql_query = agent.run(issue)
+            # Generate SQL
+            with telemetry.span("load_context"):
+                ctx = get_context(self.openai_model)
+            sql_query = self._agent(ctx).run(issue)
 
         return {"status": "success", "sql": sql_query}
     
+    def _plan_with_freshness(self, sql_query):
+        """Guard plan plus row counters of the tables it reads; token None when unknown"""
+        try:
+            with self.db.get_connection() as conn, conn.begin():
+                self.query_guard.begin_read_only(conn)
+                with telemetry.span("db_explain") as span:
+                    plan = self.query_guard.explain(conn, sql_query)
+                    span["total_cost"] = plan.get("total_cost")
+                # Relations come from the plan, so views, joins and subqueries are all covered
+                relations = plan.get("relations")
+                if relations is None:
+                    logger.warning("No query plan relations available, not caching results")
+                    return plan, None
+                if not relations:
+                    return plan, ""
+                rows = conn.execute(
+                    text(
+                        """
+                        SELECT schemaname, relname, n_tup_ins, n_tup_upd, n_tup_del
+                        FROM pg_stat_user_tables
+                        WHERE schemaname || '.' || relname = ANY(:relations)
+                        ORDER BY schemaname, relname
+                        """
+                    ),
+                    {"relations": [f"{schema}.{table}" for schema, table in relations]},
+                ).fetchall()
+        except Exception as e:
+            logger.warning(f"Could not read table statistics for result cache: {e}")
+            return None, None
+        if len(rows) < len(relations):
+            # Without counters for every table the key would miss some writes
+            logger.warning(f"No table statistics for some of {relations}, not caching results")
+            return plan, None
+        return plan, ",".join(f"{r[0]}.{r[1]}:{r[2]}:{r[3]}:{r[4]}" for r in rows)
+
+    def _export_query(self, issue_key, sql_query, export_path, plan=None):
+        export_config = self.config.export
+
+        with self.db.get_connection() as conn, conn.begin():
+            # Read-only transaction with a statement timeout, checked against the plan first
+            self.query_guard.begin_read_only(conn)
+            if plan is None:
+                with telemetry.span("db_explain") as span:
+                    plan = self.query_guard.explain(conn, sql_query)
+                    span["total_cost"] = plan.get("total_cost")
+            if plan["verdict"] == "block":
+                logger.warning(f"Blocked SQL for {issue_key}: {plan['reasons']}")
+                return None, None, plan
+
+            # Execute SQL with a server-side cursor and stream rows straight to disk
+            with telemetry.span("db_export") as span:
+                result = conn.execution_options(
+                    stream_results=True, yield_per=export_config.chunk_size
+                ).execute(text(sql_query))
+                row_count, truncated = stream_result_to_csv_gz(
+                    result,
+                    export_path,
+                    max_rows=export_config.max_rows,
+                    max_bytes=export_config.max_bytes,
+                    chunk_size=export_config.chunk_size,
+                )
+                result.close()
+                span["rows"] = row_count
+                span["truncated"] = truncated
+
+        return row_count, truncated, plan
+
     def execute_sql_and_post(self, issue_key, sql_query):
-        issue = self.jira_client.issue(issue_key)
+        with telemetry.trace("execute", issue_key):
+            return self._execute_sql_and_post(issue_key, sql_query)
 
-        # Execute SQL
-        db = Database(SQLALCHEMY_URL)
-        with db.get_connection() as conn:
-            result = conn.execute(text(sql_query)).fetchall()
-            df = pd.DataFrame(result)
+    def _execute_sql_and_post(self, issue_key, sql_query):
+        export_config = self.config.export
 
-        if df.empty:
-            self.jira_utils.post_comment(
-                issue_key, "Generated SQL returned no results: \n```\n{sql-query}\n```"
-            )
-            return {"status": "empty", "sql": sql_query}
+        file_name = f"{issue_key}_results.csv.gz"
+        export_path = self.result_cache.export_path()
 
-        tmp_dir = tempfile.gettempdir()
-        csv_path = os.path.join(tmp_dir, f"{issue_key}_results.csv")
-        df.to_csv(csv_path, index=False)
+        plan = None
+        freshness = ""
+        with telemetry.span("result_cache") as span:
+            if self.config.result_cache.freshness == "pg_stat":
+                # The plan is reused by the export, so EXPLAIN runs once
+                plan, freshness = self._plan_with_freshness(sql_query)
+            # Results whose freshness cannot be tracked are neither served nor stored
+            cache_key = None
+            cached = None
+            if freshness is not None and (plan is None or plan["verdict"] != "block"):
+                cache_key = ResultCache.make_key(
+                    sql_query, freshness, limits=(export_config.max_rows, export_config.max_bytes)
+                )
+                cached = self.result_cache.get(cache_key)
+            cache_hit = cached is not None
+            span["cache_hit"] = cache_hit
 
-        self.jira_client.add_attachment(issue=issue, attachment=csv_path)
+        try:
+            if cached is not None:
+                logger.info(f"Result cache hit for {issue_key}, skipping the database")
+                row_count, truncated = cached["row_count"], cached["truncated"]
+            else:
+                row_count, truncated, plan = self._export_query(
+                    issue_key, sql_query, export_path, plan=plan
+                )
+                if row_count is None:
+                    return {"status": "blocked", "sql": sql_query, "plan": plan}
+                if row_count and cache_key is not None:
+                    cached = self.result_cache.put(
+                        cache_key, export_path, row_count, truncated
+                    )
 
-        self.jira_utils.post_comment(
-            issue_key,
-            f"Generated SQL query: \n```\n{sql_query}\n```\n"
-            f"Results exported in and attached as: '{issue_key}_results.csv'.",
-        )
+            if row_count == 0:
+                self.jira_utils.post_comment(
+                    issue_key,
+                    f"Generated SQL returned no results: \n```\n{sql_query}\n```",
+                )
+                return {"status": "empty", "sql": sql_query, "plan": plan}
 
-        os.remove(csv_path)
+            comment = f"Generated SQL query: \n```\n{sql_query}\n```\n"
+            if cached is not None and issue_key in cached["posted_to"]:
+                # Same results are already attached to this ticket
+                comment += f"Results are unchanged and already attached as: '{file_name}'."
+            else:
+                upload_path = cached["path"] if cached is not None else export_path
+                with telemetry.span("jira_attach"):
+                    self.jira_client.add_attachment(
+                        issue=issue_key, attachment=upload_path, filename=file_name
+                    )
+                if cached is not None:
+                    self.result_cache.mark_posted(cache_key, issue_key)
+                comment += f"Results exported in and attached as: '{file_name}'."
 
-        return {"status": "success", "sql": sql_query}
+            if truncated:
+                comment += (
+                    f"\nResults were truncated to the first {row_count} rows "
+                    f"(export limits: {export_config.max_rows} rows, "
+                    f"{export_config.max_bytes} bytes)."
+                )
+            with telemetry.span("jira_comment"):
+                self.jira_utils.post_comment(issue_key, comment)
+            self._record_solved_ticket(issue_key, sql_query)
+
+        finally:
+            if os.path.exists(export_path):
+                os.remove(export_path)
+
+        return {
+            "status": "success",
+            "sql": sql_query,
+            "row_count": row_count,
+            "truncated": truncated,
+            "plan": plan,
+            "cached": cache_hit,
+        }
+
+    def _record_solved_ticket(self, issue_key, sql_query):
+        # Posted SQL becomes a reusable example for near-duplicate tickets
+        try:
+            issue = self.jira_client.issue(issue_key, fields=",".join(ISSUE_FIELDS))
+            store = get_context(self.openai_model).solved_store
+            store.add(issue_key, store.ticket_text(issue), sql_query)
+        except Exception as e:
+            logger.warning(f"Failed to record solved ticket {issue_key}: {e}")
+
+    def get_review_stats(self):
+        """None until the SQL context has been loaded by a task"""
+        ctx = get_loaded_context(self.openai_model)
+        if ctx is None:
+            return None
+        with ctx.review_stats_lock:
+            return dict(ctx.review_stats)
+
+    def get_telemetry(self, limit=50):
+        return {
+            "traces": telemetry.recent_traces(limit),
+            "spans": telemetry.span_summary(),
+            "prometheus": telemetry.render_prometheus(),
+        }
+
+    def get_pool_stats(self):
+        return pool_stats()
+
+    def get_solved_ticket_stats(self):
+        """None until the SQL context has been loaded by a task"""
+        ctx = get_loaded_context(self.openai_model)
+        return None if ctx is None else ctx.solved_store.stats()
+
+    def explain_sql(self, sql_query):
+        """Plan summary for the dashboard, without executing the query"""
+        try:
+            with self.db.get_connection() as conn, conn.begin():
+                self.query_guard.begin_read_only(conn)
+                return self.query_guard.explain(conn, sql_query)
+        except Exception as e:
+            return {"verdict": "error", "reasons": [f"EXPLAIN failed: {e}"]}
 
     def get_updated_sql_with_feedback(
         self, current_sql, jira_ticket, chat_history, max_retries
     ):
-        return self.sql_agent.update_sql_with_feedback(
-            current_sql, jira_ticket, chat_history, max_retries
-        )
+        with telemetry.trace("feedback_update"):
+            return self.sql_agent.update_sql_with_feedback(
+                current_sql, jira_ticket, chat_history, max_retries
+            )
 
     def get_in_progress(self):
 
@@ -101,6 +365,7 @@ class Services:
                 "issue_key": issue.key,
                 "summary": issue.fields.summary,
                 "description": issue.fields.description or "No description",
+                "updated": getattr(issue.fields, "updated", None),
             }
             for issue in issues
         ]
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import faiss
+import numpy as np
+
+from logger import logger
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "tickets.faiss"
+
+
+def ticket_id(issue_key):
+    """Stable signed 64-bit id, so re-solving a ticket replaces its vector"""
+    digest = hashlib.sha1(issue_key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+class SolvedTicketStore:
+    """Solved tickets as a FAISS index plus JSON metadata, stored without pickles"""
+
+    def __init__(self, path, embeddings, threshold=0.85, embedder_id=None):
+        self.path = path
+        self.embeddings = embeddings
+        self.embedder_id = embedder_id
+        self.threshold = threshold
+        self.index = None
+        # id -> {"issue_key", "ticket", "sql"}
+        self.tickets = {}
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def ticket_text(issue):
+        # Leave the issue key out so near-duplicate tickets embed close together
+        return f"{issue.fields.summary}\n{issue.fields.description or ''}".strip()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load()
+            self._loaded = True
+
+    def _load(self):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.isfile(manifest_path):
+            if os.path.isfile(os.path.join(self.path, "index.pkl")):
+                # Older pickle-backed index; replaced on the next solve
+                logger.warning("Ignoring pickled solved-ticket index; starting a new one")
+            return
+
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"unsupported format {manifest.get('format_version')}")
+
+            built_with = manifest.get("embedding_model")
+            if built_with and self.embedder_id and built_with != self.embedder_id:
+                # Rebuilt from new solves rather than matched with incompatible vectors
+                logger.warning(
+                    f"Solved-ticket index was built with '{built_with}', not "
+                    f"'{self.embedder_id}'; starting a new one"
+                )
+                return
+
+            self.index = faiss.read_index(os.path.join(self.path, INDEX_FILE))
+            self.tickets = {
+                int(ticket["id"]): ticket for ticket in manifest.get("tickets", [])
+            }
+        except Exception as e:
+            logger.warning(f"Failed to load solved-ticket index: {e}")
+            self.index = None
+            self.tickets = {}
+
+    def _save(self):
+        # Write a sibling directory, then swap it in so readers never see a partial index
+        tmp_path = f"{self.path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        faiss.write_index(self.index, os.path.join(tmp_path, INDEX_FILE))
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "embedding_model": self.embedder_id,
+            "tickets": list(self.tickets.values()),
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+
+        old_path = f"{self.path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def add(self, issue_key, ticket_text, sql_query):
+        """Stores the final SQL for a ticket, replacing any earlier entry for it"""
+        self._ensure_loaded()
+        # Embedded before taking the lock so concurrent lookups are not held up
+        vector = np.asarray(self.embeddings.embed_documents([ticket_text]), dtype=np.float32)
+        ids = np.asarray([ticket_id(issue_key)], dtype=np.int64)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vector.shape[1]))
+            if int(ids[0]) in self.tickets:
+                self.index.remove_ids(ids)
+            self.index.add_with_ids(vector, ids)
+            self.tickets[int(ids[0])] = {
+                "id": int(ids[0]),
+                "issue_key": issue_key,
+                "ticket": ticket_text,
+                "sql": sql_query,
+            }
+            self._save()
+        logger.info(f"Recorded solved ticket {issue_key}")
+
+    def find_similar(self, ticket_text, exclude_issue_key=None):
+        """Best previously solved ticket at or above the similarity threshold"""
+        self._ensure_loaded()
+        with self._lock:
+            self.lookups += 1
+            if self.index is None or self.index.ntotal == 0:
+                return None
+
+        # Embed outside the lock; search under it, since add() mutates the index in place
+        query = np.asarray([self.embeddings.embed_query(ticket_text)], dtype=np.float32)
+        with self._lock:
+            distances, labels = self.index.search(query, min(2, self.index.ntotal))
+            matches = [
+                (self.tickets.get(int(label)), float(distance))
+                for distance, label in zip(distances[0], labels[0])
+                if label != -1
+            ]
+
+        for ticket, distance in matches:
+            if ticket is None or ticket["issue_key"] == exclude_issue_key:
+                continue
+            # Squared L2 distance between unit vectors -> cosine similarity
+            similarity = 1 - distance / 2
+            if similarity < self.threshold:
+                return None
+            with self._lock:
+                self.hits += 1
+            logger.info(
+                f"Solved-ticket match {ticket['issue_key']} (similarity {similarity:.3f})"
+            )
+            return {
+                "issue_key": ticket["issue_key"],
+                "ticket": ticket["ticket"],
+                "sql": ticket["sql"],
+                "similarity": similarity,
+            }
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            }
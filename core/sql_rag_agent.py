@@ -1,14 +1,23 @@
+import difflib
 import re
+import threading
 from collections import defaultdict
 
 from langchain_community.utilities import SQLDatabase
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
+from sqlalchemy import text
 
+from core.config import config
+from core.database_connector import get_engine
+from core.query_guard import QueryGuard
 from core.schema_store import SchemaStore
+from core.solved_ticket_store import SolvedTicketStore
+from core.telemetry import telemetry
 from core.vector_store import ValueVectorStore
 from logger import logger
 from utils.jira_utils import JiraUtils
+from utils.sql_utils import referenced_tables
 
 
 class SQLResponse(BaseModel):
@@ -21,25 +30,74 @@ class ReviewedSQL(BaseModel):
 
 
 class SQLRAGContext:
-    def __init__(self, db_uri, openai_model):
-        self.db = SQLDatabase.from_uri(db_uri)
+    def __init__(self, db_uri, openai_model, db=None, llm=None):
+        # Tables are reflected on demand; schema prompts come from the snapshot
+        self.db = db or SQLDatabase(get_engine(db_uri), lazy_table_reflection=True)
         self.schema_store = SchemaStore(self.db)
-        self.value_store = ValueVectorStore()
-        self.llm = ChatOpenAI(model_name=openai_model, temperature=0)
-
-    def initialize_indexes(self, per_column_limit=200):
+        self.value_store = ValueVectorStore(
+            embedding_model=config.openai.embedding_model,
+            embedding_batch_size=config.openai.embedding_batch_size,
+            embedding_workers=config.openai.embedding_workers,
+            query_cache_size=config.index.query_cache_entries,
+            index_type=config.index.faiss_index_type,
+            nprobe=config.index.faiss_nprobe,
+            ef_search=config.index.faiss_ef_search,
+            train_size=config.index.faiss_train_size,
+            retrieval_mode=config.index.retrieval_mode,
+            lexical_shortcut_hits=config.index.lexical_shortcut_hits,
+        )
+        self.llm = llm or ChatOpenAI(model_name=openai_model, temperature=0)
+        self.openai_model = openai_model
+        self.schema_token_budget = config.openai.schema_token_budget
+        self.solved_store = None
+        self.review_stats = {"skipped": 0, "reviewed": 0, "changed": 0}
+        self.review_stats_lock = threading.Lock()
+
+    def initialize_indexes(
+        self,
+        per_column_limit=200,
+        index_path=None,
+        incremental=False,
+        embedding_cache=None,
+        sampler=None,
+        refresh_tables=None,
+    ):
         schema_rows = self.schema_store.fetch_schema()
         logger.info(f"{len(schema_rows)} columns found in schema.")
         text_cols = self.schema_store.text_like_columns(schema_rows)
         logger.info(f"{len(text_cols)} text-like columns found for indexing.")
-        self.value_store.build_index(
-            self.db, text_cols, per_column_limit=per_column_limit
+        return self.value_store.build_index(
+            self.db,
+            text_cols,
+            per_column_limit=per_column_limit,
+            index_path=index_path,
+            incremental=incremental,
+            embedding_cache=embedding_cache,
+            sampler=sampler,
+            refresh_tables=refresh_tables,
         )
 
     def retrieve_relevant_values(
         self, user_text, k_values=30, max_cols=10, max_examples_per_col=10
     ):
-        hits = self.value_store.search_values(user_text, k=k_values)
+        return self.retrieve_relevant_values_batch(
+            [user_text], k_values, max_cols, max_examples_per_col
+        )[0]
+
+    def retrieve_relevant_values_batch(
+        self, user_texts, k_values=30, max_cols=10, max_examples_per_col=10
+    ):
+        """Retrieval for many tickets with their query embeddings fetched in one request"""
+        with telemetry.span("retrieve_values", k=k_values, queries=len(user_texts)) as span:
+            hits_per_text = self.value_store.search_values_batch(user_texts, k=k_values)
+            span["hits"] = sum(len(hits) for hits in hits_per_text)
+        return [
+            self._rank_hits(hits, max_cols, max_examples_per_col)
+            for hits in hits_per_text
+        ]
+
+    @staticmethod
+    def _rank_hits(hits, max_cols, max_examples_per_col):
         grouped = defaultdict(list)
         for doc, score in hits:
             meta = doc.metadata or {}
@@ -71,6 +129,14 @@ class SQLRAGContext:
 
         return {kc: ranked[kc] for kc in top_cols if kc in ranked}
 
+    def build_schema_prompt(self, retrieved):
+        with telemetry.span("schema_prompt") as span:
+            tables = self.schema_store.tables_for_columns(retrieved.keys())
+            span["seed_tables"] = len(tables)
+            return self.schema_store.schema_prompt(
+                tables, self.schema_token_budget, self.openai_model
+            )
+
     def build_compact_context(self, retrieved):
         cols = list(retrieved.keys())
         tables = self.schema_store.tables_for_columns(cols)
@@ -94,8 +160,15 @@ class SQLRAGContext:
 
 
 class SQLRAGAgent:
-    def __init__(self, rag_ctx: SQLRAGContext):
+    def __init__(self, rag_ctx: SQLRAGContext, query_guard=None):
         self.rag_ctx = rag_ctx
+        # EXPLAIN checks run under the same statement timeout as the export
+        self.query_guard = query_guard or QueryGuard(
+            statement_timeout_ms=config.query_guard.statement_timeout_ms
+        )
+        self.solved_store = rag_ctx.solved_store
+        self.adapt_threshold = config.solved_tickets.adapt_threshold
+        self.review_complexity_threshold = config.openai.review_complexity_threshold
         self.llm = rag_ctx.llm
         self.generate_llm = self.llm.with_structured_output(SQLResponse)
         self.review_llm = self.llm.with_structured_output(ReviewedSQL)
@@ -121,25 +194,102 @@ class SQLRAGAgent:
 
         return True
 
-    def generate_sql(self, jira_ticket, compact_context, full_schema):
+    @staticmethod
+    def complexity_score(query):
+        upper = re.sub(r"'(?:[^']|'')*'", "''", query).upper()
+        return (
+            len(re.findall(r"\bJOIN\b", upper))
+            + 2 * (len(re.findall(r"\bSELECT\b", upper)) - 1)
+            + len(re.findall(r"\bUNION\b", upper))
+            + len(re.findall(r"\bOVER\s*\(", upper))
+            + len(re.findall(r"\bGROUP\s+BY\b", upper))
+            + len(re.findall(r"\bHAVING\b", upper))
+        )
+
+    def check_sql(self, query):
+        """Returns (ok, error) from local validation plus EXPLAIN; ok is None when unverified"""
+        if not self.validate_sql(query):
+            return False, "Query is not a read-only SELECT/WITH statement"
+
+        engine = self.rag_ctx.db._engine
+        if engine.dialect.name != "postgresql":
+            return None, None
+
+        try:
+            with telemetry.span("explain_check"), engine.connect() as conn, conn.begin():
+                self.query_guard.begin_read_only(conn)
+                conn.execute(text(f"EXPLAIN {query}"))
+        except Exception as e:
+            return False, str(getattr(e, "orig", e)).strip()
+        return True, None
+
+    def _record_review(self, key):
+        with self.rag_ctx.review_stats_lock:
+            self.rag_ctx.review_stats[key] += 1
+
+    def review_if_needed(self, sql_query):
+        ok, error = self.check_sql(sql_query)
+        complexity = self.complexity_score(sql_query)
+        if ok and complexity <= self.review_complexity_threshold:
+            self._record_review("skipped")
+            telemetry.record(review="skipped")
+            logger.info(f"Skipped SQL review: EXPLAIN passed, complexity {complexity}")
+            return sql_query
+
+        if error:
+            reason = f"EXPLAIN failed: {error}"
+        elif ok is None:
+            reason = "EXPLAIN unavailable"
+        else:
+            reason = f"complexity {complexity} above {self.review_complexity_threshold}"
+        reviewed: ReviewedSQL = self.review_sql(sql_query, error=error)
+        reviewed_sql = reviewed.sql.strip()
+
+        self._record_review("reviewed")
+        telemetry.record(review="reviewed")
+        if reviewed_sql != sql_query:
+            self._record_review("changed")
+            telemetry.record(review="changed")
+            diff = "\n".join(
+                difflib.unified_diff(
+                    sql_query.splitlines(), reviewed_sql.splitlines(), lineterm="", n=1
+                )
+            )
+            logger.info(f"SQL review ({reason}) changed the query:\n{diff}")
+        else:
+            logger.info(f"SQL review ({reason}) made no changes")
+        return reviewed_sql
+
+    def generate_sql(self, jira_ticket, compact_context, schema_prompt, example=None):
+        example_section = ""
+        if example:
+            example_section = f"""
+        Previously solved similar ticket (EXAMPLE — reuse its approach only where it fits this ticket):
+        {example["ticket"]}
+        ```sql
+        {example["sql"]}
+        ```
+        """
+
         prompt = f"""
         
         Jira Ticket:
         {jira_ticket}
+        {example_section}
 
         Schema Context with example values- (GUIDE — columns likely relevant to this ticket):
         {compact_context}
 
-        Full Schema - (All tables and columns):
-        {full_schema}
+        Schema Reference - (Tables and columns available, "-> table.column" marks a foreign key):
+        {schema_prompt}
 
         INSTRUCTIONS:
         - Carefully review the Jira ticket and understand what the ticket requires to be transformed into a SQL query.
         - Capture **all constraints** mentioned in the ticket (filters, groupings, breakdowns, date ranges, categories, limits).
         - The columns in the 'Relevant columns & sample values' section are **likely relevant** to the Jira ticket.
         - Use these columns as your **primary guide** when generating the SQL.
-        - You may only use other columns if required for joins or aggregation, and only if they exist in the full schema reference.
-        - Do NOT invent columns or tables not listed in the full schema reference.
+        - You may only use other columns if required for joins or aggregation, and only if they exist in the schema reference.
+        - Do NOT invent columns or tables not listed in the schema reference.
         - Only include columns explicitly requested in the ticket unless necessary for joins/aggregations.
 
         FILTER RULES:
@@ -161,9 +311,17 @@ class SQLRAGAgent:
         }}
         """
 
-        return self.generate_llm.invoke(prompt)
+        with telemetry.llm_span("generate_sql"):
+            return self.generate_llm.invoke(prompt)
+
+    def review_sql(self, sql_query, error=None):
+        error_section = ""
+        if error:
+            error_section = f"""
+        The database rejected this query with the following error. Fix it:
+        {error}
+        """
 
-    def review_sql(self, sql_query):
         prompt = f"""
         You are an SQL expert for PostgreSQL. Your task is to:
 
@@ -178,6 +336,7 @@ class SQLRAGAgent:
         ```sql
         {sql_query}
         ```
+        {error_section}
 
         Return a JSON object:
         {{
@@ -185,27 +344,87 @@ class SQLRAGAgent:
         }}
         """
 
-        return self.review_llm.invoke(prompt)
+        with telemetry.llm_span("review_sql"):
+            return self.review_llm.invoke(prompt)
+
+    def adapt_sql(self, jira_ticket, example):
+        tables = referenced_tables(example["sql"])
+        schema_prompt = self.rag_ctx.schema_store.schema_prompt(
+            tables, self.rag_ctx.schema_token_budget, self.rag_ctx.openai_model
+        )
+
+        prompt = f"""
+        You are an expert SQL assistant in PostgreSQL.
+
+        A previously solved Jira ticket is almost identical to a new one.
+        Adapt the previous SQL so it answers the new ticket exactly.
+
+        Previous ticket:
+        {example["ticket"]}
+
+        Previous SQL:
+        ```sql
+        {example["sql"]}
+        ```
+
+        New Jira ticket:
+        {jira_ticket}
+
+        Schema Reference - (Tables and columns available, "-> table.column" marks a foreign key):
+        {schema_prompt}
+
+        Rules:
+        - Only change what differs between the two tickets (filters, periods, groupings, columns).
+        - Do NOT invent columns or tables not listed in the schema reference.
+        - Do NOT DROP, DELETE, UPDATE, ALTER, CREATE.
+        - Make sure it will run successfully in PostgreSQL.
+
+        Return a JSON object:
+        {{
+            "sql": "Adapted SQL query here",
+            "notes": "What was changed from the previous SQL"
+        }}
+        """
+
+        with telemetry.llm_span("adapt_sql"):
+            return self.review_llm.invoke(prompt)
 
     def run(self, jira_ticket):
+        formatted_jira_ticket = JiraUtils.format_issue(jira_ticket)
+
+        example = None
+        if self.solved_store is not None:
+            with telemetry.span("solved_ticket_lookup") as span:
+                example = self.solved_store.find_similar(
+                    SolvedTicketStore.ticket_text(jira_ticket),
+                    exclude_issue_key=jira_ticket.key,
+                )
+                span["cache_hit"] = example is not None
+
+        if example and example["similarity"] >= self.adapt_threshold:
+            # One cheap adaptation call replaces retrieval, generation and review
+            adapted: ReviewedSQL = self.adapt_sql(formatted_jira_ticket, example)
+            sql_query = adapted.sql.strip()
+            logger.info(f"Adapted SQL from {example['issue_key']}: {adapted.notes}")
+            if self.validate_sql(sql_query):
+                return sql_query
+            logger.warning("Adapted SQL failed validation, generating from scratch")
+
         retrieved = self.rag_ctx.retrieve_relevant_values(
-            f"{jira_ticket}",
+            formatted_jira_ticket,
             k_values=30,
             max_cols=10,
             max_examples_per_col=10,
         )
 
-        formatted_jira_ticket = JiraUtils.format_issue(jira_ticket)
         compact_ctx = self.rag_ctx.build_compact_context(retrieved)
-        full_schema = self.rag_ctx.schema_store.fetch_schema()
+        schema_prompt = self.rag_ctx.build_schema_prompt(retrieved)
 
         generated_sql_query: SQLResponse = self.generate_sql(
-            formatted_jira_ticket, compact_ctx, full_schema
-        )
-        reviewed_sql_query: ReviewedSQL = self.review_sql(
-            generated_sql_query.sql.strip()
+            formatted_jira_ticket, compact_ctx, schema_prompt, example=example
         )
-        sql_query = reviewed_sql_query.sql.strip()
+        # The review LLM only runs when EXPLAIN fails or the query is complex
+        sql_query = self.review_if_needed(generated_sql_query.sql.strip())
 
         # Final validation
         if not self.validate_sql(sql_query):
@@ -216,6 +435,7 @@ class SQLRAGAgent:
     def update_sql_with_feedback(
         self, current_sql, jira_ticket, chat_history, max_retries
     ):
+        retrieved = self.rag_ctx.retrieve_relevant_values(jira_ticket)
 
         prompt = f"""
         You are an expert SQL assistant in PostgreSQL.
@@ -232,10 +452,10 @@ class SQLRAGAgent:
         {chat_history}
 
         Schema Context with example values - (GUIDE — columns likely relevant to this ticket):
-        {self.rag_ctx.build_compact_context(self.rag_ctx.retrieve_relevant_values(jira_ticket))}
+        {self.rag_ctx.build_compact_context(retrieved)}
 
-        Full Schema - (All tables and columns):
-        {self.rag_ctx.schema_store.fetch_schema()}
+        Schema Reference - (Tables and columns available, "-> table.column" marks a foreign key):
+        {self.rag_ctx.build_schema_prompt(retrieved)}
 
         Rules:
         - Do NOT DROP, DELETE, UPDATE, ALTER, CREATE.
@@ -253,7 +473,8 @@ class SQLRAGAgent:
 
         for attempt in range(max_retries + 1):
             try:
-                response = self.review_llm.invoke(prompt)
+                with telemetry.llm_span("feedback_sql", attempt=attempt + 1):
+                    response = self.review_llm.invoke(prompt)
                 updated_sql = response.sql.strip()
                 notes = response.notes
 
@@ -0,0 +1,251 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from core.config import METRICS_PATH, TRACE_LOG_PATH, config
+from logger import logger
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    def __init__(self, trace_log_path, metrics_path, enabled=True, recent_traces=200):
+        self.trace_log_path = trace_log_path
+        self.metrics_path = metrics_path
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent_traces)
+        self._span_count = defaultdict(int)
+        self._span_seconds = defaultdict(float)
+        self._span_errors = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._cache = defaultdict(int)
+        self._rows = defaultdict(int)
+        self._traces = defaultdict(int)
+
+    @contextmanager
+    def trace(self, name, issue_key=None):
+        """Groups the spans of one ticket's work; nested traces become spans"""
+        if not self.enabled or _current_trace.get() is not None:
+            with self.span(name) as attrs:
+                yield attrs
+            return
+
+        trace = {
+            "trace_id": uuid.uuid4().hex,
+            "name": name,
+            "issue_key": issue_key,
+            "started_at": time.time(),
+            "spans": [],
+            "_start": time.perf_counter(),
+        }
+        token = _current_trace.set(trace)
+        status = "ok"
+        try:
+            with self.span(name) as attrs:
+                yield attrs
+        except Exception as e:
+            status = "error"
+            trace["error"] = str(e)
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace["status"] = status
+            trace["duration_ms"] = (time.perf_counter() - trace.pop("_start")) * 1000
+            trace["spans"].sort(key=lambda s: s["start_ms"])
+            self._finish_trace(trace)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Times a stage; yields its attribute dict for tokens, cache hits and row counts"""
+        if not self.enabled:
+            yield dict(attrs)
+            return
+
+        parent = _current_span.get()
+        span = {"name": name, "depth": parent["depth"] + 1 if parent else 0, "attrs": dict(attrs)}
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span["attrs"]
+        except Exception as e:
+            span["error"] = str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_span.reset(token)
+            span["duration_ms"] = elapsed * 1000
+
+            trace = _current_trace.get()
+            if trace is not None:
+                span["start_ms"] = (start - trace["_start"]) * 1000
+                trace["spans"].append(span)
+            self._aggregate(span, elapsed)
+
+    @contextmanager
+    def llm_span(self, name, **attrs):
+        """Span that also records OpenAI prompt and completion tokens"""
+        # langchain is only needed once an LLM stage runs
+        from langchain_community.callbacks import get_openai_callback
+
+        with self.span(name, **attrs) as span_attrs:
+            with get_openai_callback() as cb:
+                yield span_attrs
+            span_attrs["prompt_tokens"] = cb.prompt_tokens
+            span_attrs["completion_tokens"] = cb.completion_tokens
+
+    def observe(self, name, seconds, **attrs):
+        """Aggregates a stage timed outside a span, e.g. before telemetry was imported"""
+        if self.enabled:
+            self._aggregate({"name": name, "attrs": attrs}, seconds)
+
+    def record(self, **attrs):
+        """Adds attributes to the innermost open span"""
+        span = _current_span.get()
+        if span is not None:
+            span["attrs"].update(attrs)
+
+    def _aggregate(self, span, elapsed):
+        name, attrs = span["name"], span["attrs"]
+        with self._lock:
+            self._span_count[name] += 1
+            self._span_seconds[name] += elapsed
+            if "error" in span:
+                self._span_errors[name] += 1
+            for kind in ("prompt", "completion"):
+                if attrs.get(f"{kind}_tokens"):
+                    self._tokens[(name, kind)] += attrs[f"{kind}_tokens"]
+            if "cache_hit" in attrs:
+                self._cache[(name, "hit" if attrs["cache_hit"] else "miss")] += 1
+            if attrs.get("rows"):
+                self._rows[name] += attrs["rows"]
+
+    def _finish_trace(self, trace):
+        with self._lock:
+            self._recent.append(trace)
+            self._traces[(trace["name"], trace["status"])] += 1
+
+        slowest = sorted(
+            (s for s in trace["spans"] if s["depth"] > 0), key=lambda s: -s["duration_ms"]
+        )[:3]
+        logger.info(
+            f"Trace {trace['name']} {trace['issue_key'] or ''} {trace['status']} in "
+            f"{trace['duration_ms']:.0f} ms; slowest: "
+            + ", ".join(f"{s['name']} {s['duration_ms']:.0f} ms" for s in slowest)
+        )
+
+        try:
+            os.makedirs(os.path.dirname(self.trace_log_path), exist_ok=True)
+            line = json.dumps(trace, default=str)
+            with self._lock:
+                with open(self.trace_log_path, "a") as f:
+                    f.write(line + "\n")
+            self.write_metrics()
+        except OSError as e:
+            logger.warning(f"Failed to write telemetry: {e}")
+
+    def recent_traces(self, limit=50):
+        with self._lock:
+            return list(self._recent)[-limit:][::-1]
+
+    def span_summary(self):
+        with self._lock:
+            return [
+                {
+                    "span": name,
+                    "count": count,
+                    "total_seconds": self._span_seconds[name],
+                    "mean_ms": self._span_seconds[name] / count * 1000,
+                    "errors": self._span_errors[name],
+                }
+                for name, count in sorted(self._span_count.items())
+            ]
+
+    def render_prometheus(self):
+        with self._lock:
+            lines = [
+                "# HELP jira_sql_span_duration_seconds Time spent in each pipeline stage",
+                "# TYPE jira_sql_span_duration_seconds summary",
+            ]
+            for name, count in sorted(self._span_count.items()):
+                lines.append(f'jira_sql_span_duration_seconds_count{{span="{_label(name)}"}} {count}')
+                lines.append(
+                    f'jira_sql_span_duration_seconds_sum{{span="{_label(name)}"}} {self._span_seconds[name]:.6f}'
+                )
+
+            lines += [
+                "# HELP jira_sql_span_errors_total Stages that raised",
+                "# TYPE jira_sql_span_errors_total counter",
+            ]
+            for name, count in sorted(self._span_errors.items()):
+                lines.append(f'jira_sql_span_errors_total{{span="{_label(name)}"}} {count}')
+
+            lines += [
+                "# HELP jira_sql_llm_tokens_total OpenAI tokens by stage",
+                "# TYPE jira_sql_llm_tokens_total counter",
+            ]
+            for (name, kind), count in sorted(self._tokens.items()):
+                lines.append(
+                    f'jira_sql_llm_tokens_total{{span="{_label(name)}",kind="{kind}"}} {count}'
+                )
+
+            lines += [
+                "# HELP jira_sql_cache_lookups_total Cache lookups by stage and result",
+                "# TYPE jira_sql_cache_lookups_total counter",
+            ]
+            for (name, result), count in sorted(self._cache.items()):
+                lines.append(
+                    f'jira_sql_cache_lookups_total{{span="{_label(name)}",result="{result}"}} {count}'
+                )
+
+            lines += [
+                "# HELP jira_sql_rows_total Rows produced by stage",
+                "# TYPE jira_sql_rows_total counter",
+            ]
+            for name, count in sorted(self._rows.items()):
+                lines.append(f'jira_sql_rows_total{{span="{_label(name)}"}} {count}')
+
+            lines += [
+                "# HELP jira_sql_traces_total Completed ticket traces",
+                "# TYPE jira_sql_traces_total counter",
+            ]
+            for (name, status), count in sorted(self._traces.items()):
+                lines.append(
+                    f'jira_sql_traces_total{{trace="{_label(name)}",status="{status}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        # Write then rename so scrapers never read a partial file; each writer has its own tmp file
+        directory = os.path.dirname(self.metrics_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, self.metrics_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# Process-wide, so traces from background jobs and reruns land in one place
+telemetry = Telemetry(
+    TRACE_LOG_PATH,
+    METRICS_PATH,
+    enabled=config.telemetry.enabled,
+    recent_traces=config.telemetry.recent_traces,
+)
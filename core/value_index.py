@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import shutil
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from core.lexical_index import LexicalIndex
+from logger import logger
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "values.faiss"
+
+# Flat codes and inverted lists are paged in from disk on demand. Only one flag:
+# combined with IO_FLAG_MMAP, reading any IVF index fails
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def value_id(table, column, value):
+    """Stable signed 64-bit id, so unchanged values keep their vectors across builds"""
+    digest = hashlib.sha1(f"{table}\x1f{column}\x1f{value}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+def _load_array(path, mmap):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+class ValueIndex:
+    """FAISS index plus array-backed metadata, stored without pickles.
+
+    Rows are ordered by id; each row has an interned column id and a slice of
+    the UTF-8 blob holding its value.
+    """
+
+    def __init__(
+        self, index, ids, column_ids, offsets, blob, columns, manifest=None, lexical=None
+    ):
+        self.index = index
+        self.ids = ids
+        self.column_ids = column_ids
+        self.offsets = offsets
+        self.blob = blob
+        self.columns = columns
+        self.manifest = manifest or {}
+        self.lexical = lexical
+
+    @classmethod
+    def from_entries(cls, index, entries, manifest=None):
+        """Builds metadata from (id, table, column, value) tuples already added to index"""
+        entries = sorted(entries, key=lambda e: e[0])
+        column_lookup = {}
+        column_ids = np.empty(len(entries), dtype=np.int32)
+        offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+        chunks = []
+        for row, (_, table, column, value) in enumerate(entries):
+            column_ids[row] = column_lookup.setdefault((table, column), len(column_lookup))
+            encoded = value.encode("utf-8")
+            chunks.append(encoded)
+            offsets[row + 1] = offsets[row] + len(encoded)
+
+        return cls(
+            index,
+            np.fromiter((e[0] for e in entries), dtype=np.int64, count=len(entries)),
+            column_ids,
+            offsets,
+            np.frombuffer(b"".join(chunks), dtype=np.uint8),
+            [list(c) for c in column_lookup],
+            manifest,
+            lexical=LexicalIndex.build([e[3] for e in entries]),
+        )
+
+    @staticmethod
+    def exists(path):
+        return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Opens a saved index; with mmap the vectors and metadata stay on disk"""
+        with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported value index format {manifest.get('format_version')}"
+            )
+
+        index_file = os.path.join(path, INDEX_FILE)
+        try:
+            index = faiss.read_index(index_file, MMAP_FLAGS if mmap else 0)
+        except RuntimeError as e:
+            if not mmap:
+                raise
+            # Some index structures cannot be memory-mapped; read them into memory
+            logger.warning(f"Could not memory-map {index_file}, loading it fully: {e}")
+            index = faiss.read_index(index_file, 0)
+
+        blob_path = os.path.join(path, "values.bin")
+        if mmap and os.path.getsize(blob_path) > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+
+        return cls(
+            index,
+            _load_array(os.path.join(path, "ids.npy"), mmap),
+            _load_array(os.path.join(path, "column_ids.npy"), mmap),
+            _load_array(os.path.join(path, "offsets.npy"), mmap),
+            blob,
+            manifest["columns"],
+            manifest,
+            lexical=LexicalIndex.load(path, mmap) if LexicalIndex.exists(path) else None,
+        )
+
+    def save(self, path, **manifest):
+        # Write a sibling directory, then swap it in so readers never see a partial index
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        faiss.write_index(self.index, os.path.join(tmp_path, INDEX_FILE))
+        np.save(os.path.join(tmp_path, "ids.npy"), np.asarray(self.ids))
+        np.save(os.path.join(tmp_path, "column_ids.npy"), np.asarray(self.column_ids))
+        np.save(os.path.join(tmp_path, "offsets.npy"), np.asarray(self.offsets))
+        np.asarray(self.blob).tofile(os.path.join(tmp_path, "values.bin"))
+        if self.lexical is not None:
+            self.lexical.save(tmp_path)
+
+        self.manifest = {
+            **self.manifest,
+            **manifest,
+            "format_version": FORMAT_VERSION,
+            "count": len(self),
+            "dimension": self.index.d,
+            "columns": self.columns,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(self.manifest, f)
+
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        logger.info(f"Saved value index with {len(self)} values to {path}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def id_set(self):
+        return set(np.asarray(self.ids).tolist())
+
+    def entries(self):
+        """Yields (id, table, column, value) for every row"""
+        for row in range(len(self)):
+            table, column = self.columns[self.column_ids[row]]
+            yield int(self.ids[row]), table, column, self.value(row)
+
+    def value(self, row):
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def metadata(self, row):
+        table, column = self.columns[self.column_ids[row]]
+        return {"table": table, "column": column, "value": self.value(row)}
+
+    def document(self, row):
+        meta = self.metadata(row)
+        return Document(page_content=meta["value"], metadata=meta)
+
+    def search_rows(self, vector, k=8):
+        """Nearest rows as (row, L2 distance) pairs, closest first"""
+        if len(self) == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        distances, labels = self.index.search(query, min(k, len(self)))
+
+        hits = []
+        for distance, label in zip(distances[0], labels[0]):
+            if label == -1:
+                continue
+            row = int(np.searchsorted(self.ids, label))
+            if row >= len(self) or self.ids[row] != label:
+                continue
+            hits.append((row, float(distance)))
+        return hits
+
+    def search(self, vector, k=8):
+        """Nearest values as (Document, L2 distance) pairs, closest first"""
+        return [(self.document(row), distance) for row, distance in self.search_rows(vector, k)]
+
+    def search_lexical(self, text, k=8):
+        """BM25 matches as (row, score, exact); empty for indexes saved without one"""
+        if self.lexical is None:
+            return []
+        return self.lexical.search(text, self.value, k)
@@ -0,0 +1,138 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import text
+
+from logger import logger
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class ValueSampler:
+    def __init__(
+        self,
+        engine,
+        per_column_limit=200,
+        max_workers=4,
+        scan_rows=100000,
+        use_pg_stats=True,
+        schema="public",
+    ):
+        self.engine = engine
+        self.per_column_limit = per_column_limit
+        self.max_workers = max_workers
+        self.scan_rows = scan_rows
+        self.use_pg_stats = use_pg_stats
+        self.schema = schema
+        self.timings = {}
+
+    @property
+    def is_postgres(self):
+        return self.engine.dialect.name == "postgresql"
+
+    def sample(self, text_columns):
+        """Returns {(table, column): [distinct values]} sampled with one scan per table"""
+        columns_by_table = defaultdict(list)
+        for table, col in text_columns:
+            columns_by_table[table].append(col)
+
+        samples = {}
+        self.timings = {}
+
+        if self.is_postgres and self.use_pg_stats:
+            samples.update(self._sample_from_pg_stats(columns_by_table))
+            for (table, col) in samples:
+                columns_by_table[table].remove(col)
+            columns_by_table = {t: cols for t, cols in columns_by_table.items() if cols}
+
+        if not columns_by_table:
+            return samples
+
+        max_workers = max(1, min(self.max_workers, len(columns_by_table)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._sample_table, table, cols): table
+                for table, cols in columns_by_table.items()
+            }
+            for future in as_completed(futures):
+                table = futures[future]
+                try:
+                    table_samples, elapsed = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to sample values from {table}: {e}")
+                    continue
+                samples.update(table_samples)
+                self.timings[table] = elapsed
+                logger.info(
+                    f"Sampled {len(table_samples)} columns from {table} in {elapsed:.2f}s"
+                )
+
+        return samples
+
+    def _sample_from_pg_stats(self, columns_by_table):
+        # Planner statistics already hold the most common values of analysed columns
+        sql = """
+        SELECT tablename, attname, most_common_vals::text::text[], n_distinct
+        FROM pg_stats
+        WHERE schemaname = :schema
+        """
+        start = time.perf_counter()
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(sql), {"schema": self.schema}).fetchall()
+        except Exception as e:
+            logger.warning(f"pg_stats lookup failed, falling back to table scans: {e}")
+            return {}
+
+        samples = {}
+        for table, col, common_vals, n_distinct in rows:
+            if col not in columns_by_table.get(table, ()) or not common_vals:
+                continue
+            # Only trust pg_stats when it covers the column or the requested sample size
+            complete = 0 < n_distinct <= len(common_vals)
+            if complete or len(common_vals) >= self.per_column_limit:
+                samples[(table, col)] = common_vals[: self.per_column_limit]
+
+        self.timings["pg_stats"] = time.perf_counter() - start
+        logger.info(f"Sampled {len(samples)} columns from pg_stats")
+        return samples
+
+    def _sample_table(self, table, columns):
+        start = time.perf_counter()
+        if self.is_postgres:
+            samples = self._sample_table_single_scan(table, columns)
+        else:
+            samples = self._sample_table_per_column(table, columns)
+        return samples, time.perf_counter() - start
+
+    def _sample_table_single_scan(self, table, columns):
+        limit = f" LIMIT {int(self.scan_rows)}" if self.scan_rows else ""
+        selected = ", ".join(_quote(c) for c in columns)
+        aggregates = ", ".join(
+            f"(array_agg(DISTINCT {_quote(c)}::text) "
+            f"FILTER (WHERE {_quote(c)} IS NOT NULL))[1:{int(self.per_column_limit)}]"
+            for c in columns
+        )
+        sql = f"""
+        WITH sample AS (SELECT {selected} FROM {_quote(table)}{limit})
+        SELECT {aggregates} FROM sample
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(text(sql)).fetchone()
+
+        return {(table, col): list(row[i] or []) for i, col in enumerate(columns)}
+
+    def _sample_table_per_column(self, table, columns):
+        samples = {}
+        with self.engine.connect() as conn:
+            for col in columns:
+                sql = (
+                    f"SELECT DISTINCT {_quote(col)} FROM {_quote(table)} "
+                    f"LIMIT {int(self.per_column_limit)}"
+                )
+                rows = conn.execute(text(sql)).fetchall()
+                samples[(table, col)] = [r[0] for r in rows]
+        return samples
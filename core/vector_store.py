@@ -1,45 +1,306 @@
+import re
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+import faiss
+import numpy as np
 from langchain_community.utilities import SQLDatabase
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from sqlalchemy import text
-
+from core.embeddings import embedder_id, get_embeddings
+from core.faiss_index import build_empty_index, is_flat, tune_index
+from core.lexical_index import is_strong_phrase, phrase
+from core.telemetry import telemetry
+from core.value_index import ValueIndex, value_id
+from core.value_sampler import ValueSampler
 from logger import logger
 
+# Reciprocal rank fusion constant; higher flattens the contribution of top ranks
+RRF_K = 60
+
 
 class ValueVectorStore:
-    def __init__(self, embedding_model="text-embedding-3-small"):
-        self.embeddings = OpenAIEmbeddings(model=embedding_model)
-        self.vs: Optional[FAISS] = None
-
-    def build_index(self, db: SQLDatabase, text_columns, per_column_limit=200):
-        docs, metas = [], []
-        for table, col in text_columns:
-            sql = f'SELECT DISTINCT "{col}" FROM "{table}" LIMIT {per_column_limit};'
-            try:
-                with db._engine.connect() as conn:
-                    rows = conn.execute(text(sql)).fetchall()
-                logger.info(f"Fetched {len(rows)} rows from {table}.{col}")
-            except Exception as e:
-                rows = []
-                logger.warning(f"Failed to fetch from {table}.{col}: {e}")
-            for r in rows:
-                val = r[0]
+    def __init__(
+        self,
+        embedding_model="text-embedding-3-small",
+        query_cache_size=1024,
+        embedding_cache=None,
+        index_type="flat",
+        nprobe=16,
+        ef_search=64,
+        train_size=50000,
+        retrieval_mode="hybrid",
+        lexical_shortcut_hits=2,
+        embedding_batch_size=256,
+        embedding_workers=4,
+    ):
+        self.embedding_model = embedder_id(embedding_model)
+        self.embeddings = get_embeddings(
+            embedding_model, batch_size=embedding_batch_size, max_workers=embedding_workers
+        )
+        self.index: Optional[ValueIndex] = None
+
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_size = train_size
+
+        # vector, lexical, or hybrid (fused, skipping embedding on strong literal matches)
+        self.retrieval_mode = retrieval_mode
+        self.lexical_shortcut_hits = lexical_shortcut_hits
+
+        # Query vectors: in-memory LRU in front of the on-disk embedding cache
+        self.embedding_cache = embedding_cache
+        self.query_cache_size = query_cache_size
+        self.query_cache = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def adopt_runtime_state(self, previous):
+        """Shares query caches and their lock with the store this one replaces"""
+        # Query embeddings do not depend on the index snapshot
+        self.embedding_cache = previous.embedding_cache
+        self.query_cache = previous.query_cache
+        self._query_lock = previous._query_lock
+
+    def sample_values(self, db: SQLDatabase, text_columns, per_column_limit=200, sampler=None):
+        if sampler is None:
+            sampler = ValueSampler(db._engine, per_column_limit=per_column_limit)
+
+        values = {}
+        for (table, col), rows in sampler.sample(text_columns).items():
+            for val in rows:
                 if val is None:
                     continue
                 s = str(val)
                 if not s.strip():
                     continue
-                docs.append(s)
-                metas.append({"table": table, "column": col, "value": s})
+                values[value_id(table, col, s)] = (table, col, s)
+        return values
+
+    def embed_texts(self, texts, embedding_cache=None):
+        """Returns (vectors by text, set of texts sent to the embedding API)"""
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = {}
+        if embedding_cache is not None:
+            vectors = embedding_cache.get_many(self.embedding_model, unique_texts)
 
-        if docs:
-            self.vs = FAISS.from_texts(docs, self.embeddings, metadatas=metas)
+        missing = [t for t in unique_texts if t not in vectors]
+        if missing:
+            embedded = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            if embedding_cache is not None:
+                embedding_cache.put_many(self.embedding_model, embedded)
+            vectors.update(embedded)
+
+        return vectors, set(missing)
+
+    def _can_update(self, previous):
+        # Only exact flat indexes delete in place; anything else is rebuilt
+        return (
+            previous is not None
+            and self.index_type.lower() == "flat"
+            and is_flat(previous.index)
+            and previous.manifest.get("embedding_model") == self.embedding_model
+        )
+
+    def build_index(
+        self,
+        db: SQLDatabase,
+        text_columns,
+        per_column_limit=200,
+        index_path=None,
+        incremental=False,
+        embedding_cache=None,
+        sampler=None,
+        refresh_tables=None,
+    ):
+        previous = None
+        if incremental and index_path and ValueIndex.exists(index_path):
+            try:
+                previous = ValueIndex.load(index_path, mmap=False)
+            except Exception as e:
+                logger.warning(f"Could not load existing index, rebuilding: {e}")
+
+        if refresh_tables is not None and previous is not None:
+            # Only refresh_tables are re-sampled; other tables keep their indexed values
+            kept = {c for c in text_columns if c[0] not in refresh_tables}
+            values = {
+                i: (table, col, value)
+                for i, table, col, value in previous.entries()
+                if (table, col) in kept
+            }
+            values.update(
+                self.sample_values(
+                    db,
+                    [c for c in text_columns if c[0] in refresh_tables],
+                    per_column_limit,
+                    sampler,
+                )
+            )
         else:
-            self.vs = None
+            values = self.sample_values(db, text_columns, per_column_limit, sampler)
+
+        existing_ids = previous.id_set() if previous is not None else set()
+        deleted_ids = existing_ids - values.keys()
+        new_ids = [i for i in values if i not in existing_ids]
+
+        if self._can_update(previous):
+            index = previous.index
+            if deleted_ids:
+                index.remove_ids(np.asarray(sorted(deleted_ids), dtype=np.int64))
+            add_ids = new_ids
+        else:
+            if previous is not None and embedding_cache is None:
+                logger.warning(
+                    f"Rebuilding {self.index_type} index without an embedding cache re-embeds every value"
+                )
+            index = None
+            add_ids = list(values)
+
+        texts = [values[i][2] for i in add_ids]
+        vectors, embedded_texts = self.embed_texts(texts, embedding_cache)
+        embedded = sum(1 for t in texts if t in embedded_texts)
+
+        if add_ids:
+            matrix = np.asarray([vectors[t] for t in texts], dtype=np.float32)
+            if index is None:
+                index = faiss.IndexIDMap2(
+                    build_empty_index(matrix, self.index_type, train_size=self.train_size)
+                )
+            index.add_with_ids(matrix, np.asarray(add_ids, dtype=np.int64))
+
+        if index is None:
+            # Every value is gone: save an empty index so the old one is not loaded again
+            if previous is not None:
+                dimension = previous.index.d
+            else:
+                dimension = len(self.embeddings.embed_query("dimension"))
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+
+        self.index = ValueIndex.from_entries(index, [(i, *values[i]) for i in values])
+        self.tune()
+
+        stats = {
+            "new": embedded,
+            "reused": len(values) - embedded,
+            "deleted": len(deleted_ids),
+            "index_type": self.index_type,
+        }
+        logger.info(
+            f"Value index: {stats['new']} new embeddings, {stats['reused']} reused, "
+            f"{stats['deleted']} deleted"
+        )
+        return stats
+
+    def save(self, index_path):
+        if self.index is not None:
+            self.index.save(
+                index_path,
+                index_type=self.index_type,
+                embedding_model=self.embedding_model,
+            )
+
+    def load(self, index_path, mmap=True):
+        index = ValueIndex.load(index_path, mmap=mmap)
+        built_with = index.manifest.get("embedding_model")
+        if built_with != self.embedding_model:
+            # Vectors from another embedder are meaningless to this one's queries
+            raise ValueError(
+                f"Value index was built with embedder '{built_with}' but EMBEDDING_MODEL is "
+                f"'{self.embedding_model}'; rebuild it with jobs.initialise_indexes"
+            )
+        self.index = index
+        self.tune()
+
+    def tune(self):
+        if self.index is not None:
+            tune_index(self.index.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    @staticmethod
+    def normalize_query(text):
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    def embed_queries(self, texts):
+        """Query vectors in input order, embedding all uncached texts in one request"""
+        keys = [self.normalize_query(t) for t in texts]
+        originals = dict(zip(keys, texts))
+        vectors = {}
+        with self._query_lock:
+            for key in keys:
+                if key in self.query_cache:
+                    self.query_cache.move_to_end(key)
+                    vectors[key] = self.query_cache[key]
+
+        # Kept apart from value embeddings, which are keyed by exact text
+        cache_model = f"{self.embedding_model}:query"
+        missing = [k for k in originals if k not in vectors]
+        if missing and self.embedding_cache is not None:
+            vectors.update(self.embedding_cache.get_many(cache_model, missing))
+            missing = [k for k in missing if k not in vectors]
+
+        if missing:
+            embedded = dict(
+                zip(missing, self.embeddings.embed_documents([originals[k] for k in missing]))
+            )
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(cache_model, embedded)
+            vectors.update(embedded)
+            logger.info(f"Embedded {len(missing)} of {len(keys)} queries")
+
+        with self._query_lock:
+            for key in originals:
+                self.query_cache[key] = vectors[key]
+                self.query_cache.move_to_end(key)
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+
+        return [vectors[key] for key in keys]
 
     def search_values(self, text, k=8):
-        if not self.vs:
-            return []
-        return self.vs.similarity_search_with_score(text, k=k)
+        return self.search_values_batch([text], k=k)[0]
+
+    def search_values_batch(self, texts, k=8):
+        """Per text, (Document, score) pairs where a lower score is a better match"""
+        if not self.index or not texts:
+            return [[] for _ in texts]
+
+        mode = self.retrieval_mode
+        if mode == "vector" or self.index.lexical is None:
+            return [self.index.search(vector, k=k) for vector in self.embed_queries(texts)]
+
+        lexical = [self.index.search_lexical(text, k=k) for text in texts]
+        if mode == "lexical":
+            return [self._fuse([], hits, k) for hits in lexical]
+
+        # Tickets naming enough values verbatim are answered without an embedding call
+        needs_vector = [i for i, hits in enumerate(lexical) if not self._lexical_only(hits, k)]
+        telemetry.record(lexical_only=len(texts) - len(needs_vector))
+
+        vector_hits = {}
+        if needs_vector:
+            vectors = self.embed_queries([texts[i] for i in needs_vector])
+            for i, vector in zip(needs_vector, vectors):
+                vector_hits[i] = self.index.search_rows(vector, k=k)
+
+        return [self._fuse(vector_hits.get(i, []), hits, k) for i, hits in enumerate(lexical)]
+
+    def _lexical_only(self, hits, k):
+        # Needs a full page of hits and enough distinct strong literals, not repeated rows
+        if not self.lexical_shortcut_hits or len(hits) < k:
+            return False
+        literals = {phrase(self.index.value(row)) for row, _, exact in hits if exact}
+        strong = [literal for literal in literals if is_strong_phrase(literal)]
+        return len(strong) >= self.lexical_shortcut_hits
+
+    def _fuse(self, vector_hits, lexical_hits, k):
+        # Reciprocal rank fusion of vector, BM25 and exact-match rankings
+        scores = {}
+        rankings = [
+            [row for row, _ in vector_hits],
+            [row for row, _, _ in lexical_hits],
+            [row for row, _, exact in lexical_hits if exact],
+        ]
+        for ranking in rankings:
+            for rank, row in enumerate(ranking):
+                scores[row] = scores.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        best = sorted(scores.items(), key=lambda x: -x[1])[:k]
+        return [(self.index.document(row), -score) for row, score in best]
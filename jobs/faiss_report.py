@@ -0,0 +1,65 @@
+import argparse
+
+import numpy as np
+
+from core.config import EMBEDDING_CACHE_PATH, VECTOR_PATH, BASE_DIR, config
+from core.embedding_cache import EmbeddingCache
+from core.faiss_index import INDEX_TYPES, base_index, is_flat, recall_report
+from core.value_index import ValueIndex
+from logger import logger
+from utils.json_utils import save_to_json
+
+
+def load_vectors(index_path):
+    value_index = ValueIndex.load(index_path, mmap=False)
+    if is_flat(value_index.index):
+        flat = base_index(value_index.index)
+        return flat.reconstruct_n(0, flat.ntotal)
+
+    # Compressed indexes only hold approximate vectors; use the exact cached ones
+    texts = [value for _, _, _, value in value_index.entries()]
+    cached = EmbeddingCache(EMBEDDING_CACHE_PATH).get_many(
+        value_index.manifest.get("embedding_model"), texts
+    )
+    missing = len(texts) - len(cached)
+    if missing:
+        logger.warning(f"{missing} vectors missing from the embedding cache, skipped")
+    return np.asarray(list(cached.values()), dtype=np.float32)
+
+
+parser = argparse.ArgumentParser(description="Recall vs latency of FAISS index types")
+parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES))
+parser.add_argument("--nprobe", nargs="+", type=int, default=[1, 4, 16, 64])
+parser.add_argument("--ef-search", nargs="+", type=int, default=[16, 64, 256])
+parser.add_argument("--k", type=int, default=30)
+parser.add_argument("--queries", type=int, default=200)
+parser.add_argument("--output", default=f"{BASE_DIR}/data/faiss_report.json")
+args = parser.parse_args()
+
+try:
+    vectors = load_vectors(VECTOR_PATH)
+    logger.info(f"Loaded {len(vectors)} vectors of dimension {vectors.shape[1]}")
+
+    report = recall_report(
+        vectors,
+        index_types=args.types,
+        nprobes=args.nprobe,
+        ef_searches=args.ef_search,
+        k=args.k,
+        n_queries=args.queries,
+        train_size=config.index.faiss_train_size,
+    )
+    save_to_json(report, args.output)
+
+    for row in report["results"]:
+        setting = ", ".join(
+            f"{key}={row[key]}" for key in ("nprobe", "ef_search") if key in row
+        )
+        logger.info(
+            f"{row['factory']:<20} {setting:<14} recall@{report['k']}={row['recall_at_k']:.3f} "
+            f"mean={row['mean_latency_ms']:.2f}ms p95={row['p95_latency_ms']:.2f}ms "
+            f"size={row['size_bytes'] / 1e6:.1f}MB build={row['build_seconds']:.1f}s"
+        )
+    logger.info(f"Report written to {args.output}")
+except Exception as e:
+    logger.error(f"Failed to build FAISS report: {e}", exc_info=True)
@@ -1,19 +1,128 @@
-from core.config import SCHEMA_PATH, SQLALCHEMY_URL, VECTOR_PATH
+import argparse
+import os
+
+from core.config import (
+    EMBEDDING_CACHE_PATH,
+    SCHEMA_FINGERPRINT_PATH,
+    SCHEMA_PATH,
+    SQLALCHEMY_URL,
+    VECTOR_PATH,
+    config,
+)
+from core.embedding_cache import EmbeddingCache
+from core.schema_store import SchemaStore
 from core.sql_rag_agent import SQLRAGContext
+from core.value_index import ValueIndex
+from core.value_sampler import ValueSampler
 from logger import logger
-from utils.json_utils import save_to_json
+from utils.json_utils import load_from_json, save_to_json
 
-try:
-    db_uri = SQLALCHEMY_URL
-    ctx = SQLRAGContext(db_uri, openai_model="gpt-4o")
+
+def load_previous_snapshot():
+    # Both files are needed to diff against; otherwise everything counts as new
+    if not (os.path.isfile(SCHEMA_PATH) and os.path.isfile(SCHEMA_FINGERPRINT_PATH)):
+        return None, None
+    try:
+        return load_from_json(SCHEMA_PATH), load_from_json(SCHEMA_FINGERPRINT_PATH)
+    except Exception as e:
+        logger.warning(f"Could not read previous schema snapshot: {e}")
+        return None, None
+
+
+def index_matches_config(value_store):
+    # A new embedder or index type invalidates every stored vector
+    if not ValueIndex.exists(VECTOR_PATH):
+        return False
+    manifest = load_from_json(os.path.join(VECTOR_PATH, "manifest.json"))
+    return (
+        manifest.get("embedding_model") == value_store.embedding_model
+        and manifest.get("index_type") == value_store.index_type
+    )
+
+
+def log_diff(diff):
+    labels = {
+        "added_tables": "Added tables",
+        "dropped_tables": "Dropped tables",
+        "added_columns": "Added columns",
+        "dropped_columns": "Dropped columns",
+        "retyped_columns": "Retyped columns",
+    }
+    for key, label in labels.items():
+        if diff[key]:
+            logger.info(f"{label} ({len(diff[key])}): {', '.join(diff[key])}")
+
+
+def initialise(full=False):
+    ctx = SQLRAGContext(SQLALCHEMY_URL, openai_model="gpt-4o")
     # Fetch schema
     schema_rows = ctx.schema_store.fetch_schema()
+    if not schema_rows:
+        raise RuntimeError("No columns fetched from the database; keeping the existing snapshot")
+    fingerprint = SchemaStore.snapshot_fingerprint(schema_rows)
+
+    previous_rows, previous_fingerprint = load_previous_snapshot()
+    incremental = previous_rows is not None and not full and index_matches_config(ctx.value_store)
+    if incremental and previous_fingerprint.get("fingerprint") == fingerprint["fingerprint"]:
+        logger.info(
+            f"Schema fingerprint {fingerprint['fingerprint']} unchanged, "
+            "skipping snapshot and index refresh"
+        )
+        return
+
+    refresh_tables = None
+    if previous_rows is not None:
+        diff = SchemaStore.diff_schemas(previous_rows, schema_rows)
+        log_diff(diff)
+        if incremental:
+            # Key-only changes rewrite the snapshot but keep every table's sampled values
+            refresh_tables = set(diff["changed_tables"])
+            logger.info(f"Re-sampling {len(refresh_tables)} changed tables")
+
+    # One scan per table, tables sampled in parallel
+    sampler = ValueSampler(
+        ctx.db._engine,
+        per_column_limit=config.index.per_column_limit,
+        max_workers=config.index.sample_workers,
+        scan_rows=config.index.sample_scan_rows,
+        use_pg_stats=config.index.use_pg_stats,
+        schema=ctx.schema_store.schema,
+    )
+
+    # Build vector store, re-embedding only values not seen before
+    stats = ctx.initialize_indexes(
+        per_column_limit=config.index.per_column_limit,
+        index_path=VECTOR_PATH,
+        incremental=True,
+        embedding_cache=EmbeddingCache(
+            EMBEDDING_CACHE_PATH,
+            ttl_seconds=config.index.embedding_cache_ttl_seconds,
+            max_entries=config.index.embedding_cache_max_entries,
+        ),
+        sampler=sampler,
+        refresh_tables=refresh_tables,
+    )
+    ctx.value_store.save(VECTOR_PATH)
+    # Snapshot written after the index, so an interrupted run diffs against the old one
     save_to_json(schema_rows, SCHEMA_PATH)
+    save_to_json(fingerprint, SCHEMA_FINGERPRINT_PATH)
 
-    # Build vector store
-    ctx.initialize_indexes(per_column_limit=200)
-    ctx.value_store.vs.save_local(VECTOR_PATH)
+    for table, elapsed in sorted(sampler.timings.items(), key=lambda x: -x[1]):
+        logger.info(f"Sampling time {table}: {elapsed:.2f}s")
 
-    logger.info("Initialised schema and vector index")
+    logger.info(
+        f"Initialised schema and vector index: {stats['new']} new, "
+        f"{stats['reused']} reused, {stats['deleted']} deleted embeddings"
+    )
+
+
+parser = argparse.ArgumentParser(description="Refresh the schema snapshot and value index")
+parser.add_argument(
+    "--full", action="store_true", help="Re-sample every table even if the schema is unchanged"
+)
+args = parser.parse_args()
+
+try:
+    initialise(full=args.full)
 except Exception as e:
     logger.error(f"Failed to initialise schema and vector index: {e}", exc_info=True)
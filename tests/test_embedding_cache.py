@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from core.embedding_cache import EmbeddingCache
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_entries=2)
+    cache.put_many("m", {"a": [1.0]})
+    cache.put_many("m", {"b": [2.0]})
+    time.sleep(0.01)
+    assert cache.get_many("m", ["a"]) == {"a": [1.0]}
+
+    cache.put_many("m", {"c": [3.0]})
+
+    assert cache.get_many("m", ["a", "b", "c"]) == {"a": [1.0], "c": [3.0]}
+
+
+def test_entries_unused_for_the_ttl_expire(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), ttl_seconds=60)
+    cache.put_many("m", {"old": [1.0]})
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("UPDATE embeddings SET last_accessed = ?", (time.time() - 120,))
+
+    cache.put_many("m", {"new": [2.0]})
+
+    assert cache.get_many("m", ["old", "new"]) == {"new": [2.0]}
+
+
+def test_caches_without_access_times_are_migrated(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE embeddings (model TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        conn.execute(
+            "INSERT INTO embeddings VALUES (?, ?, ?)",
+            ("m", EmbeddingCache.text_hash("a"), b"\x00\x00\x80?"),
+        )
+
+    cache = EmbeddingCache(path)
+    cache.put_many("m", {"b": [2.0]})
+
+    assert cache.get_many("m", ["a", "b"]) == {"a": [1.0], "b": [2.0]}
@@ -0,0 +1,28 @@
+import errno
+import os
+from unittest import mock
+
+from core.result_cache import ResultCache
+
+
+def test_put_moves_export_written_on_another_filesystem(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    source = tmp_path / "export.csv.gz"
+    source.write_bytes(b"results")
+    key = ResultCache.make_key("select 1")
+
+    cross_device = OSError(errno.EXDEV, "Invalid cross-device link")
+    with mock.patch("os.rename", side_effect=cross_device):
+        entry = cache.put(key, str(source), row_count=1, truncated=False)
+
+    assert not source.exists()
+    with open(entry["path"], "rb") as f:
+        assert f.read() == b"results"
+    assert cache.get(key)["row_count"] == 1
+
+
+def test_export_path_is_inside_the_cache_directory(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    path = cache.export_path()
+    assert os.path.dirname(path) == cache.directory
+    assert os.path.exists(path)
@@ -0,0 +1,33 @@
+from core.embeddings import get_embeddings
+from core.solved_ticket_store import SolvedTicketStore
+
+TICKET = "Monthly revenue by region\nBreak down 2024 revenue per sales region"
+
+
+def test_solved_tickets_persist_and_replace(tmp_path):
+    path = str(tmp_path / "solved")
+    embeddings = get_embeddings("hashing:64")
+    store = SolvedTicketStore(path, embeddings, threshold=0.9, embedder_id="hashing:64")
+    store.add("DATA-1", TICKET, "SELECT 1")
+    store.add("DATA-1", TICKET, "SELECT region, sum(revenue) FROM sales GROUP BY region")
+    store.add("DATA-2", "Delete stale customers", "SELECT 2")
+
+    reloaded = SolvedTicketStore(path, embeddings, threshold=0.9, embedder_id="hashing:64")
+    match = reloaded.find_similar(TICKET, exclude_issue_key="DATA-9")
+
+    assert match["issue_key"] == "DATA-1"
+    assert match["sql"].startswith("SELECT region")
+    assert reloaded.index.ntotal == 2
+    assert reloaded.find_similar(TICKET, exclude_issue_key="DATA-1") is None
+
+
+def test_index_from_another_embedder_is_not_loaded(tmp_path):
+    path = str(tmp_path / "solved")
+    SolvedTicketStore(path, get_embeddings("hashing:64"), embedder_id="hashing:64").add(
+        "DATA-1", TICKET, "SELECT 1"
+    )
+
+    other = SolvedTicketStore(path, get_embeddings("hashing:32"), embedder_id="hashing:32")
+
+    assert other.find_similar(TICKET) is None
+    assert other.index is None
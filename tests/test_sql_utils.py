@@ -0,0 +1,47 @@
+from utils.sql_utils import qualified_tables, referenced_tables
+
+
+def test_schema_qualified_names_keep_the_table():
+    sql = "select * from public.orders o join sales.Customers c on c.id = o.customer_id"
+    assert qualified_tables(sql) == [("public", "orders"), ("sales", "customers")]
+    assert referenced_tables(sql) == ["customers", "orders"]
+
+
+def test_unqualified_mixed_case_names_are_folded():
+    assert qualified_tables("SELECT * FROM Orders JOIN line_Items USING (id)") == [
+        (None, "line_items"),
+        (None, "orders"),
+    ]
+
+
+def test_quoted_names_keep_their_case():
+    sql = 'select * from "Sales"."OrderLines" join "Orders" using (id) join "my ""x"" t" using (id)'
+    assert qualified_tables(sql) == [
+        (None, "Orders"),
+        (None, 'my "x" t'),
+        ("Sales", "OrderLines"),
+    ]
+
+
+def test_string_literals_are_ignored():
+    assert referenced_tables("select 'from fake' from orders where note = 'join x'") == [
+        "orders"
+    ]
+
+
+def test_comma_separated_from_list():
+    sql = "SELECT * FROM orders o, sales.customers AS c, line_items WHERE o.id = c.id"
+    assert qualified_tables(sql) == [
+        (None, "line_items"),
+        (None, "orders"),
+        ("sales", "customers"),
+    ]
+
+
+def test_from_inside_expressions_is_not_a_table():
+    sql = (
+        "SELECT EXTRACT(year FROM created_at), SUBSTRING(name FROM 1 FOR 3) "
+        "FROM orders, unnest(tags) t(tag) "
+        "WHERE status IS DISTINCT FROM closed_status AND id IN (SELECT order_id FROM refunds)"
+    )
+    assert qualified_tables(sql) == [(None, "orders"), (None, "refunds")]
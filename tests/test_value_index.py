@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import faiss
+
+from core.faiss_index import INDEX_TYPES, build_empty_index
+from core.value_index import ValueIndex, value_id
+
+
+def build_value_index(index_type, n=1200, dim=16):
+    vectors = np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+    ids = np.asarray([value_id("orders", "status", f"value {i}") for i in range(n)], dtype=np.int64)
+    index = faiss.IndexIDMap2(build_empty_index(vectors, index_type))
+    index.add_with_ids(vectors, ids)
+    entries = [(int(ids[i]), "orders", "status", f"value {i}") for i in range(n)]
+    return ValueIndex.from_entries(index, entries), vectors
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_save_load_search_round_trip(tmp_path, index_type, mmap):
+    value_index, vectors = build_value_index(index_type)
+    path = str(tmp_path / "values")
+    value_index.save(path, index_type=index_type)
+
+    loaded = ValueIndex.load(path, mmap=mmap)
+
+    assert len(loaded) == len(value_index)
+    assert loaded.manifest["index_type"] == index_type
+    hits = loaded.search(vectors[7], k=5)
+    assert hits
+    assert "value 7" in [doc.page_content for doc, _ in hits]
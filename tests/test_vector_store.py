@@ -0,0 +1,78 @@
+import faiss
+import numpy as np
+
+from core.value_index import ValueIndex, value_id
+from core.vector_store import ValueVectorStore
+
+VALUES = [
+    ("orders", "status", "open"),
+    ("tickets", "status", "open"),
+    ("customers", "segment", "enterprise"),
+    ("products", "name", "product"),
+    ("customers", "region", "North America"),
+    ("orders", "channel", "partner referral"),
+    ("products", "category", "accessories"),
+]
+
+
+def build_store():
+    store = ValueVectorStore(embedding_model="hashing:64")
+    texts = [value for _, _, value in VALUES]
+    vectors = np.asarray(store.embeddings.embed_documents(texts), dtype=np.float32)
+    ids = np.asarray([value_id(*v) for v in VALUES], dtype=np.int64)
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+    index.add_with_ids(vectors, ids)
+    store.index = ValueIndex.from_entries(index, [(int(i), *v) for i, v in zip(ids, VALUES)])
+
+    calls = []
+    embed_queries = store.embed_queries
+    store.embed_queries = lambda texts: calls.append(texts) or embed_queries(texts)
+    return store, calls
+
+
+def test_short_repeated_literals_still_embed_and_fill_k():
+    store, calls = build_store()
+    ticket = "Total revenue from enterprise customers for open orders by product"
+
+    hits = store.search_values(ticket, k=5)
+
+    assert calls
+    assert len(hits) == 5
+
+
+def test_distinct_strong_literals_skip_embedding():
+    store, calls = build_store()
+    ticket = "Partner referral orders from North America with open status and accessories"
+
+    hits = store.search_values(ticket, k=3)
+
+    assert not calls
+    assert len(hits) == 3
+
+
+class StaticSampler:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def sample(self, columns):
+        return {column: self.rows.get(column, []) for column in columns}
+
+
+def test_incremental_build_without_values_replaces_the_saved_index(tmp_path):
+    path = str(tmp_path / "values")
+    columns = [("orders", "status")]
+    store = ValueVectorStore(embedding_model="hashing:64")
+    store.build_index(None, columns, index_path=path, sampler=StaticSampler({columns[0]: ["open"]}))
+    store.save(path)
+
+    store = ValueVectorStore(embedding_model="hashing:64")
+    stats = store.build_index(
+        None, columns, index_path=path, incremental=True, sampler=StaticSampler({})
+    )
+    store.save(path)
+
+    loaded = ValueVectorStore(embedding_model="hashing:64")
+    loaded.load(path)
+    assert stats["deleted"] == 1
+    assert len(loaded.index) == 0
+    assert loaded.search_values("open orders") == []
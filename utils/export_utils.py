@@ -0,0 +1,35 @@
+import csv
+import gzip
+import io
+
+
+def stream_result_to_csv_gz(result, path, max_rows=None, max_bytes=None, chunk_size=10000):
+    """Writes a SQLAlchemy result to a gzip CSV in chunks, returning (rows, truncated)"""
+    row_count = 0
+    truncated = False
+
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            with io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(list(result.keys()))
+
+                limit_reached = False
+                for chunk in result.partitions(chunk_size):
+                    if limit_reached:
+                        truncated = True
+                        break
+
+                    if max_rows is not None and row_count + len(chunk) > max_rows:
+                        chunk = chunk[: max_rows - row_count]
+                        truncated = True
+
+                    writer.writerows(chunk)
+                    row_count += len(chunk)
+                    if truncated:
+                        break
+
+                    # Compressed bytes flushed to disk so far
+                    limit_reached = max_bytes is not None and raw.tell() >= max_bytes
+
+    return row_count, truncated
@@ -1,21 +1,124 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from jira import JIRA, JIRAError
 
+from core.telemetry import telemetry
 from logger import logger
 
+# Only the fields the dashboard and agents read
+ISSUE_FIELDS = ["summary", "description", "updated", "status"]
+
+SQL_BLOCK_PATTERN = re.compile(r"```\n(.*?)\n```", re.S)
+
+
+def extract_sql(body):
+    match = SQL_BLOCK_PATTERN.search(body or "")
+    return match.group(1).strip() if match else None
+
+
+class CommentCache:
+    """Comments per issue, valid while the issue's `updated` timestamp is unchanged"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, issue_key, updated=None):
+        with self._lock:
+            entry = self._entries.get(issue_key)
+        if entry is None:
+            return None
+        cached_updated, comments = entry
+        if updated is not None and updated != cached_updated:
+            return None
+        return comments
+
+    def put(self, issue_key, updated, comments):
+        with self._lock:
+            self._entries[issue_key] = (updated, comments)
+
+    def invalidate(self, issue_key):
+        with self._lock:
+            self._entries.pop(issue_key, None)
+
+
+# Shared across Services instances so fresh sessions reuse fetched comments
+shared_comment_cache = CommentCache()
+
 
 class JiraUtils:
-    def __init__(self, jira_client: JIRA, jira_project_key):
+    def __init__(
+        self,
+        jira_client: JIRA,
+        jira_project_key,
+        page_size=100,
+        max_issues=1000,
+        max_workers=4,
+        comment_cache=None,
+    ):
         self.jira = jira_client
         self.jira_project_key = jira_project_key
+        self.page_size = page_size
+        self.max_issues = max_issues
+        self.max_workers = max_workers
+        self.comment_cache = comment_cache or shared_comment_cache
+
+    def get_issues(self, status, jql=None, fields=ISSUE_FIELDS, expand=None):
+        """Fetches every matching issue up to max_issues; pass fields=None for all fields"""
+        with telemetry.span("jira_search", status=status) as span:
+            issues = self._get_issues(status, jql, fields, expand)
+            span["issues"] = len(issues)
+        return issues
 
-    def get_issues(self, status, jql=None):
+    def _get_issues(self, status, jql, fields, expand):
         if jql is None:
             if status == "In Progress":
                 jql = f'project="{self.jira_project_key}" AND status="{status}" AND assignee=currentUser()'
             else:
                 jql = f'project="{self.jira_project_key}" AND status="{status}"'
 
-        return self.jira.search_issues(jql)
+        fields = ",".join(fields) if fields else None
+
+        # Jira Cloud only offers token-based paging, so pages cannot be fetched in parallel
+        if getattr(self.jira, "_is_cloud", False):
+            return list(
+                self.jira.enhanced_search_issues(
+                    jql, maxResults=self.max_issues, fields=fields, expand=expand
+                )
+            )
+
+        first_page = self.jira.search_issues(
+            jql,
+            startAt=0,
+            maxResults=min(self.page_size, self.max_issues),
+            fields=fields,
+            expand=expand,
+        )
+        issues = list(first_page)
+        total = min(getattr(first_page, "total", len(issues)) or 0, self.max_issues)
+        if len(issues) >= total:
+            return issues
+
+        def fetch_page(start_at):
+            return self.jira.search_issues(
+                jql,
+                startAt=start_at,
+                maxResults=min(self.page_size, total - start_at),
+                fields=fields,
+                expand=expand,
+                validate_query=False,
+            )
+
+        starts = range(len(issues), total, self.page_size)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            # map keeps page order
+            for page in executor.map(fetch_page, starts):
+                issues.extend(page)
+
+        logger.info(f"Fetched {len(issues)} of {first_page.total} issues for status '{status}'")
+        return issues
 
     def progress_ticket(self, issue_key):
         try:
@@ -31,9 +134,12 @@ class JiraUtils:
         except JIRAError as e:
             logger.error(f"Failed to move {issue_key} to processing: {e}")
 
-    def get_ticket_comments(self, issue_key):
-        issue = self.jira.issue(issue_key)
-        comments = self.jira.comments(issue)
+    def get_ticket_comments(self, issue_key, updated=None):
+        cached = self.comment_cache.get(issue_key, updated)
+        if cached is not None:
+            return cached
+
+        comments = self.jira.comments(issue_key)
 
         results = [
             {
@@ -41,15 +147,43 @@ class JiraUtils:
                 "author": comment.author.displayName,
                 "body": comment.body,
                 "created": comment.created,
+                # Parsed once here rather than on every render
+                "sql": extract_sql(comment.body),
             }
             for comment in comments
         ]
 
+        self.comment_cache.put(issue_key, updated, results)
         return results
 
+    def prefetch_comments(self, issues):
+        """Fetches comments for all stale issues in one concurrent batch"""
+        stale = [
+            issue
+            for issue in issues
+            if self.comment_cache.get(issue["issue_key"], issue.get("updated")) is None
+        ]
+        if not stale:
+            return
+
+        def fetch(issue):
+            try:
+                self.get_ticket_comments(issue["issue_key"], issue.get("updated"))
+            except JIRAError as e:
+                logger.error(f"Failed to fetch comments for {issue['issue_key']}: {e}")
+
+        with telemetry.span("jira_comments", issues=len(stale)):
+            with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                list(executor.map(fetch, stale))
+
+    @staticmethod
+    def latest_sql(comments):
+        return next((c["sql"] for c in reversed(comments) if c["sql"]), None)
+
     def post_comment(self, issue_key, comment):
         try:
             self.jira.add_comment(issue_key, comment)
+            self.comment_cache.invalidate(issue_key)
             logger.info(f"Comment posted to issue {issue_key}")
         except JIRAError as e:
             logger.error(f"Failed to post comment to issue {issue_key}: {e}")
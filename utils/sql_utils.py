@@ -0,0 +1,113 @@
+import re
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_TOKEN = re.compile(rf"{_IDENTIFIER}|\S")
+# FROM inside these calls separates arguments, it does not name a table
+_VALUE_FROM_FUNCTIONS = {"extract", "substring", "trim", "overlay", "position"}
+# Words that end a FROM item rather than alias it
+_CLAUSE_KEYWORDS = {
+    "where", "on", "using", "join", "inner", "left", "right", "full", "outer", "cross",
+    "natural", "group", "order", "having", "limit", "offset", "union", "intersect",
+    "except", "window", "for", "fetch", "returning", "tablesample", "set", "into",
+}
+
+
+def _normalise_identifier(identifier):
+    # Postgres folds unquoted names to lower case; quoted names keep their case
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.lower()
+
+
+def _is_identifier(token):
+    return re.fullmatch(_IDENTIFIER, token) is not None
+
+
+def _skip_parens(tokens, i):
+    # tokens[i] is "("; returns the index just past its matching ")"
+    depth = 0
+    while i < len(tokens):
+        if tokens[i] == "(":
+            depth += 1
+        elif tokens[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _from_items(tokens, i):
+    """Tables in the comma-separated FROM/JOIN list starting at tokens[i]"""
+    tables = set()
+    while i < len(tokens):
+        while i < len(tokens) and tokens[i].lower() in ("only", "lateral"):
+            i += 1
+        if i >= len(tokens):
+            break
+        if tokens[i] == "(":
+            # Subquery: its own FROM clauses are picked up by the outer scan
+            i = _skip_parens(tokens, i)
+        elif _is_identifier(tokens[i]):
+            name = [tokens[i]]
+            i += 1
+            if i + 1 < len(tokens) and tokens[i] == "." and _is_identifier(tokens[i + 1]):
+                name.append(tokens[i + 1])
+                i += 2
+            if i < len(tokens) and tokens[i] == "(":
+                # Set-returning function such as unnest(...) or generate_series(...)
+                i = _skip_parens(tokens, i)
+            elif len(name) == 2:
+                tables.add((_normalise_identifier(name[0]), _normalise_identifier(name[1])))
+            else:
+                tables.add((None, _normalise_identifier(name[0])))
+        else:
+            break
+
+        # Optional alias and column alias list
+        if i < len(tokens) and tokens[i].lower() == "as":
+            i += 1
+        if (
+            i < len(tokens)
+            and _is_identifier(tokens[i])
+            and tokens[i].lower() not in _CLAUSE_KEYWORDS
+        ):
+            i += 1
+        if i < len(tokens) and tokens[i] == "(":
+            i = _skip_parens(tokens, i)
+
+        if i < len(tokens) and tokens[i] == ",":
+            i += 1
+            continue
+        break
+    return tables
+
+
+def qualified_tables(sql_query):
+    """(schema or None, table) pairs in FROM/JOIN lists, ignoring string literals"""
+    tokens = _TOKEN.findall(_STRING_LITERAL.sub(" ", sql_query))
+    tables = set()
+    # Word before each open parenthesis, to spot FROM used inside EXTRACT(... FROM ...)
+    callers = []
+    for i, token in enumerate(tokens):
+        lower = token.lower()
+        if token == "(":
+            callers.append(tokens[i - 1].lower() if i else "")
+        elif token == ")":
+            if callers:
+                callers.pop()
+        elif lower == "join":
+            tables |= _from_items(tokens, i + 1)
+        elif lower == "from":
+            in_value_function = bool(callers) and callers[-1] in _VALUE_FROM_FUNCTIONS
+            # IS [NOT] DISTINCT FROM compares two values
+            after_distinct = i > 0 and tokens[i - 1].lower() == "distinct"
+            if not (in_value_function or after_distinct):
+                tables |= _from_items(tokens, i + 1)
+    return sorted(tables, key=lambda t: (t[0] or "", t[1]))
+
+
+def referenced_tables(sql_query):
+    """Table names in FROM/JOIN lists, without any schema qualifier"""
+    return sorted({table for _, table in qualified_tables(sql_query)})
@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from logger import logger
+
+
+@lru_cache(maxsize=None)
+def _encoding_for_model(model):
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text, model="gpt-4o"):
+    encoding = _encoding_for_model(model)
+    if encoding is None:
+        # Rough average for English text and SQL identifiers
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))